@@ -0,0 +1,206 @@
+import time
+import hashlib
+import logging
+import threading
+
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+
+logger = logging.getLogger(__name__)
+
+
+class Flight:
+    """Value being computed, other callers wait for it instead."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class LRUCache:
+    """
+    Bounded in-process LRU cache with hit/miss/eviction counters.
+    With shared set to an alias from CACHES (e.g. a redis cache), misses
+    fall through to that cache, so results are shared between workers.
+    """
+
+    def __init__(
+        self,
+        maxsize,
+        shared=None,
+        prefix='lru',
+        timeout=None,
+        lock_timeout=30,
+    ):
+        self.maxsize = maxsize
+        self.shared = shared
+        self.prefix = prefix
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self.data = OrderedDict()
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def get_shared_key(self, key):
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return f'{self.prefix}:{digest}'
+
+    def get(self, key):
+        """Cached value or None."""
+        with self.lock:
+            if key in self.data:
+                self.data.move_to_end(key)
+                self.hits += 1
+                return self.data[key]
+
+        value = None
+        if self.shared:
+            try:
+                value = caches[self.shared].get(self.get_shared_key(key))
+            except Exception:
+                logger.exception('Shared cache %s is unavailable', self.shared)
+        if value is None:
+            with self.lock:
+                self.misses += 1
+            return None
+
+        with self.lock:
+            self.shared_hits += 1
+        self.set(key, value, shared=False)
+        return value
+
+    def set(self, key, value, shared=True):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+        if shared and self.shared:
+            try:
+                caches[self.shared].set(
+                    self.get_shared_key(key),
+                    value,
+                    self.timeout,
+                )
+            except Exception:
+                logger.exception('Shared cache %s is unavailable', self.shared)
+
+    def get_or_set(self, key, compute):
+        """
+        Cached value, otherwise computed once by compute(). Threads asking
+        for the same key meanwhile wait for that result, and with a shared
+        cache other workers wait on a lock in it instead of computing too.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not flight.event.wait(self.lock_timeout):
+                return compute()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self.compute_once(key, compute)
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.event.set()
+        return flight.value
+
+    def compute_once(self, key, compute):
+        """Compute and store a value, unless another worker is on it."""
+        lock_key = f'{self.get_shared_key(key)}:lock'
+        locked = self.acquire(lock_key)
+        try:
+            if not locked:
+                value = self.wait_shared(key, lock_key)
+                if value is not None:
+                    with self.lock:
+                        self.coalesced += 1
+                    self.set(key, value, shared=False)
+                    return value
+            value = compute()
+            self.set(key, value)
+            return value
+        finally:
+            if locked:
+                self.release(lock_key)
+
+    def acquire(self, lock_key):
+        """Take a lock in the shared cache, always granted without one."""
+        if not self.shared:
+            return True
+        try:
+            return caches[self.shared].add(lock_key, 1, self.lock_timeout)
+        except Exception:
+            logger.exception('Shared cache %s is unavailable', self.shared)
+            return True
+
+    def release(self, lock_key):
+        if not self.shared:
+            return
+        try:
+            caches[self.shared].delete(lock_key)
+        except Exception:
+            logger.exception('Shared cache %s is unavailable', self.shared)
+
+    def wait_shared(self, key, lock_key):
+        """Value stored by the worker holding the lock, None on timeout."""
+        cache = caches[self.shared]
+        deadline = time.monotonic() + self.lock_timeout
+        delay = 0.01
+        try:
+            while time.monotonic() < deadline:
+                value = cache.get(self.get_shared_key(key))
+                if value is not None:
+                    return value
+                if cache.get(lock_key) is None:
+                    return cache.get(self.get_shared_key(key))
+                time.sleep(delay)
+                delay = min(delay * 2, 0.5)
+        except Exception:
+            logger.exception('Shared cache %s is unavailable', self.shared)
+        return None
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'size': len(self.data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'coalesced': self.coalesced,
+            }
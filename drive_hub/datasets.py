@@ -0,0 +1,116 @@
+import os
+import json
+import pickle
+import hashlib
+import logging
+import threading
+
+from pathlib import Path
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Bump when the cached form of datasets changes
+CACHE_FORMAT = 1
+
+
+class Dataset:
+    """
+    JSON file loaded on first access. data keeps the parsed value for the
+    life of the process, read() parses it without keeping it. With
+    DATASETS_CACHE_DIR set the parsed value is also pickled there and
+    reused by later processes while the file stays the same.
+    """
+
+    def __init__(self, name, path, transform=None):
+        self.name = name
+        self.path = Path(path)
+        self.transform = transform
+        self.lock = threading.Lock()
+        self._data = None
+        self._digest = None
+
+    def __repr__(self):
+        return f'<Dataset {self.name}: {self.path}>'
+
+    @property
+    def loaded(self):
+        return self._data is not None
+
+    @property
+    def data(self):
+        if self._data is None:
+            with self.lock:
+                if self._data is None:
+                    self._data = self.load()
+        return self._data
+
+    def read(self):
+        """Parsed value, not kept in memory unless it is already loaded."""
+        if self._data is not None:
+            return self._data
+        return self.load()
+
+    def get_digest(self):
+        """sha1 of the file contents."""
+        if self._digest is None:
+            self._digest = hashlib.sha1(self.path.read_bytes()).hexdigest()
+        return self._digest
+
+    def get_cache_path(self):
+        directory = getattr(settings, 'DATASETS_CACHE_DIR', None)
+        if not directory:
+            return None
+        stat = self.path.stat()
+        return Path(directory) / (
+            f'{self.name}-{stat.st_size}-{stat.st_mtime_ns}-'
+            f'{CACHE_FORMAT}.pickle'
+        )
+
+    def load(self):
+        cache_path = self.get_cache_path()
+        if cache_path is not None:
+            try:
+                with open(cache_path, 'rb') as f:
+                    return pickle.load(f)
+            except FileNotFoundError:
+                pass
+            except Exception:
+                logger.exception('Broken dataset cache %s', cache_path)
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if self.transform is not None:
+            data = self.transform(data)
+
+        if cache_path is not None:
+            self.save_cache(cache_path, data)
+        return data
+
+    def save_cache(self, cache_path, data):
+        """Write the cache file atomically, other processes may read it."""
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = cache_path.with_suffix(f'.{os.getpid()}.tmp')
+            with open(temporary, 'wb') as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, cache_path)
+        except OSError:
+            logger.exception('Could not write dataset cache %s', cache_path)
+
+
+registry = {}
+
+
+def register(name, path, transform=None):
+    """Add a dataset to the registry, nothing is read yet."""
+    dataset = registry.get(name)
+    if dataset is None:
+        dataset = registry[name] = Dataset(name, path, transform)
+    return dataset
+
+
+def get_dataset(name):
+    return registry[name]
@@ -167,6 +167,38 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Directory for pickled copies of the JSON datasets, parsed once and
+# reused by every process afterwards (e.g. BASE_DIR / 'datasets')
+DATASETS_CACHE_DIR = os.environ.get('DATASETS_CACHE_DIR')
+
+# Prebuilt route artifacts, see `manage.py build_routes`
+ROUTES_DIR = BASE_DIR / 'routes'
+
+# Shortest ways: 'table' lookup, or a search on the 'networkx'/'csr' graph
+ROUTES_BACKEND = 'table'
+# Search used on the graph backends: 'dijkstra' or 'astar'
+ROUTES_ALGORITHM = 'dijkstra'
+# Cities allowed on each side of a distance matrix
+ROUTES_MATRIX_SIZE = 200
+# Time a multi-stop trip may spend improving the order of stops, seconds
+ROUTES_TOUR_TIME = 0.2
+
+# Route results kept per process, and an optional alias from CACHES
+# (e.g. a redis cache) to share them between workers
+ROUTES_CACHE_SIZE = 1024
+ROUTES_SHARED_CACHE = None
+
+# Stations returned for a map viewport, larger areas come as clusters
+STATIONS_AREA_LIMIT = 500
+# Clusters of a viewport are cells of a grid this many cells wide
+STATIONS_CLUSTER_GRID = 16
+# Precomputed clusters: zoom levels 0 to STATIONS_MAX_ZOOM, stations
+# within a cell this many pixels wide on the map are one cluster
+STATIONS_MAX_ZOOM = 16
+STATIONS_CLUSTER_PIXELS = 64
+# Rendered json pages of the station lists kept per process
+STATIONS_PAGE_CACHE_SIZE = 2048
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -33,6 +33,14 @@ from users.views import (
     PasswordResetLinkAPIView,
     PasswordResetAPIView,
     RouteAPIView,
+    RouteBatchAPIView,
+    DistanceMatrixAPIView,
+    MultiStopAPIView,
+    CityAutocompleteAPIView,
+    RouteCacheAPIView,
+    ReachableAPIView,
+    RefuelRouteAPIView,
+    TripCostAPIView,
     EmailVerificateAPIView,
     CommentLikeAPIView,
     CommentDeleteAPIView
@@ -44,6 +52,9 @@ from fuels.views import (
     OkkoAPIView,
     UkrnaftaAPIView,
     AnpAPIView,
+    NearestStationsAPIView,
+    StationAreaAPIView,
+    StationClustersAPIView,
     FuelPricesAPIView,
 )
 from cars.views import CarViewSet, FineViewSet
@@ -93,9 +104,56 @@ urlpatterns = [
         name='ukrnafta_stations',
     ),
     path('anp-stations/', AnpAPIView.as_view(), name='anp_stations'),
+    path(
+        'stations/nearest/',
+        NearestStationsAPIView.as_view(),
+        name='stations_nearest',
+    ),
+    path(
+        'stations/area/',
+        StationAreaAPIView.as_view(),
+        name='stations_area',
+    ),
+    path(
+        'stations/clusters/',
+        StationClustersAPIView.as_view(),
+        name='stations_clusters',
+    ),
 
     # Custom views
     path('routes/', RouteAPIView.as_view(), name='routes'),
+    path('routes/batch/', RouteBatchAPIView.as_view(), name='routes_batch'),
+    path(
+        'routes/matrix/',
+        DistanceMatrixAPIView.as_view(),
+        name='routes_matrix',
+    ),
+    path(
+        'routes/multi-stop/',
+        MultiStopAPIView.as_view(),
+        name='routes_multi_stop',
+    ),
+    path(
+        'cities/autocomplete/',
+        CityAutocompleteAPIView.as_view(),
+        name='cities_autocomplete',
+    ),
+    path('routes/cache/', RouteCacheAPIView.as_view(), name='routes_cache'),
+    path(
+        'routes/reachable/',
+        ReachableAPIView.as_view(),
+        name='routes_reachable',
+    ),
+    path(
+        'routes/refuel/',
+        RefuelRouteAPIView.as_view(),
+        name='routes_refuel',
+    ),
+    path(
+        'routes/trip-cost/',
+        TripCostAPIView.as_view(),
+        name='routes_trip_cost',
+    ),
     path('fuel-prices/', FuelPricesAPIView.as_view()),
     path(
         'delete-comment/<int:comment_id>/',
@@ -0,0 +1,101 @@
+import threading
+import numpy as np
+
+from django.conf import settings
+
+from fuels.stations import get_store
+
+from users.geo import GridIndex
+
+
+# Map tiles are TILE_SIZE pixels wide, 2 ** zoom tiles around the world
+TILE_SIZE = 256
+
+_levels = None
+_lock = threading.Lock()
+
+
+def project(lat, lon):
+    """Web Mercator x and y of points, both from 0 to 1."""
+    lat = np.radians(np.clip(lat, -85.05112878, 85.05112878))
+    x = (np.asarray(lon) + 180) / 360
+    y = (1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2
+    return x, y
+
+
+class ClusterLevel:
+    """
+    Stations of one zoom level grouped by cells of a Web Mercator grid,
+    cells are `pixels` wide on the map. Every cluster keeps the count,
+    centroid and number of stations of each brand.
+    """
+
+    def __init__(self, store, zoom, pixels):
+        self.zoom = zoom
+        self.brands = store.brands
+        cells = 2 ** zoom * TILE_SIZE // pixels
+        x, y = project(store.lat, store.lon)
+        rows = np.minimum((y * cells).astype(np.int64), cells - 1)
+        cols = np.minimum((x * cells).astype(np.int64), cells - 1)
+        keys, clusters = np.unique(rows * cells + cols, return_inverse=True)
+
+        self.counts = np.bincount(clusters)
+        self.lat = np.bincount(clusters, weights=store.lat) / self.counts
+        self.lon = np.bincount(clusters, weights=store.lon) / self.counts
+        self.brand_counts = np.zeros(
+            (len(keys), len(store.brands)),
+            dtype=np.int64,
+        )
+        np.add.at(self.brand_counts, (clusters, store.brand), 1)
+        # a few clusters per cell of the index, in degrees of longitude
+        self.index = GridIndex(self.lat, self.lon, cell=360 / cells * 4)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def in_box(self, south, west, north, east):
+        """Clusters with the centroid inside a rectangle, as rows."""
+        found = self.index.in_box(south, west, north, east)
+        return [
+            [
+                round(lat, 6),
+                round(lon, 6),
+                count,
+                {
+                    brand: number
+                    for brand, number in zip(self.brands, brand_counts)
+                    if number
+                },
+            ]
+            for lat, lon, count, brand_counts in zip(
+                self.lat[found].tolist(),
+                self.lon[found].tolist(),
+                self.counts[found].tolist(),
+                self.brand_counts[found].tolist(),
+            )
+        ]
+
+
+def get_cluster_levels():
+    """Station clusters of every zoom level, built once."""
+    global _levels
+    if _levels is None:
+        with _lock:
+            if _levels is None:
+                store = get_store()
+                _levels = [
+                    ClusterLevel(
+                        store,
+                        zoom,
+                        settings.STATIONS_CLUSTER_PIXELS,
+                    )
+                    for zoom in range(settings.STATIONS_MAX_ZOOM + 1)
+                ]
+    return _levels
+
+
+def get_clusters(south, west, north, east, zoom):
+    """Clusters of a zoom level inside a map viewport."""
+    levels = get_cluster_levels()
+    level = levels[min(zoom, len(levels) - 1)]
+    return level.in_box(south, west, north, east)
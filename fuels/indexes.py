@@ -0,0 +1,124 @@
+import re
+import threading
+
+from collections import defaultdict
+
+from fuels.stations import get_store
+
+from users.cities import fold, normalize
+
+
+TOKENS = re.compile(r'[^\W_]+')
+# Words are also indexed by their substrings of this length
+GRAM = 3
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+class Selection:
+    """
+    Stations at some positions of a list, without copying them.
+    Paginators only read its length and the slice of one page.
+    """
+
+    def __init__(self, stations, positions):
+        self.stations = stations
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __iter__(self):
+        return (self.stations[i] for i in self.positions)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.stations[i] for i in self.positions[item]]
+        return self.stations[self.positions[item]]
+
+
+class TokenIndex:
+    """
+    Inverted index over texts of stations at some positions: every word
+    of a text, folded by key (normalize by default), maps to the positions
+    of the stations having it. search(key) finds the stations whose
+    folded text has key at the start of a word.
+    """
+
+    def __init__(self, texts, positions, key=normalize):
+        self.values = dict(zip(positions, map(key, texts)))
+        tokens = defaultdict(list)
+        for position, value in self.values.items():
+            for token in set(TOKENS.findall(value)):
+                tokens[token].append(position)
+        self.tokens = dict(tokens)
+
+        grams = defaultdict(list)
+        for token in self.tokens:
+            for gram in {
+                token[i:i + GRAM] for i in range(len(token) - GRAM + 1)
+            }:
+                grams[gram].append(token)
+        self.grams = dict(grams)
+
+    def __len__(self):
+        return len(self.values)
+
+    def get_tokens(self, piece):
+        """
+        Words containing piece, looked up by its rarest trigram. Pieces
+        shorter than a trigram fall back to a scan of all words.
+        """
+        if len(piece) < GRAM:
+            return [token for token in self.tokens if piece in token]
+        rarest = min(
+            (
+                self.grams.get(piece[i:i + GRAM], [])
+                for i in range(len(piece) - GRAM + 1)
+            ),
+            key=len,
+        )
+        return [token for token in rarest if piece in token]
+
+    def get_candidates(self, key):
+        """
+        Positions that may have key, in order, none when key has no word.
+        A run of letters in key always lies inside one word of a value,
+        so only stations with a word containing the longest run qualify.
+        """
+        pieces = TOKENS.findall(key)
+        if not pieces:
+            return []
+        piece = max(pieces, key=len)
+        found = [self.tokens[token] for token in self.get_tokens(piece)]
+        if len(found) == 1:
+            return found[0]
+        return sorted({position for group in found for position in group})
+
+    def search(self, key):
+        """Positions of the stations with key at the start of a word."""
+        start = re.compile(r'(?<![^\W_])' + re.escape(key))
+        return [
+            position for position in self.get_candidates(key)
+            if start.search(self.values[position])
+        ]
+
+
+def get_token_index(brand, column, latin=True):
+    """
+    Token index over a text column of the stations of a brand, words
+    transliterated to Latin or, with latin=False, kept as written.
+    """
+    key = (brand, column, latin)
+    if key not in _indexes:
+        with _lock:
+            if key not in _indexes:
+                store = get_store()
+                positions = store.get_positions(brand)
+                _indexes[key] = TokenIndex(
+                    store.get_texts(column, positions),
+                    positions,
+                    normalize if latin else fold,
+                )
+    return _indexes[key]
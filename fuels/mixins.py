@@ -1,6 +1,35 @@
+from bisect import bisect_right
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+
 from rest_framework.generics import ListAPIView
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    Cursor,
+    CursorPagination,
+    PageNumberPagination,
+)
+from rest_framework.utils.urls import remove_query_param
+
+from drive_hub.cache import LRUCache
+
+from fuels.indexes import TOKENS, Selection, get_token_index
+from fuels.stations import get_store
+
+from users.cities import CYRILLIC, fold, normalize, resolve_city
+from users.utils import stream_json_list
+
+
+# Stations serialized at once when the whole list is streamed
+STREAM_CHUNK = 500
+
+page_cache = LRUCache(
+    maxsize=settings.STATIONS_PAGE_CACHE_SIZE,
+    prefix='stations',
+)
 
 
 class StationPaginate(PageNumberPagination):
@@ -9,30 +38,123 @@ class StationPaginate(PageNumberPagination):
     max_page_size = 50
 
 
+class StationCursorPaginate(CursorPagination):
+    """
+    Pages of a station selection after a cursor, the store position of
+    the last station of the previous page. Positions are sorted, so a
+    page costs a bisect and page_size rows, with no count.
+    """
+
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.positions = queryset.positions
+
+        cursor = self.decode_cursor(request)
+        if cursor is None:
+            self.start = 0
+        else:
+            try:
+                position = int(cursor.position)
+            except (TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            self.start = bisect_right(self.positions, position)
+
+        end = self.start + self.page_size
+        self.has_next = end < len(self.positions)
+        return queryset[self.start:end]
+
+    def get_start_link(self, start):
+        """Link to the page starting at an index of the positions."""
+        if start == 0:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        position = str(self.positions[start - 1])
+        return self.encode_cursor(Cursor(0, False, position))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.get_start_link(self.start + self.page_size)
+
+    def get_previous_link(self):
+        if self.start == 0:
+            return None
+        return self.get_start_link(max(self.start - self.page_size, 0))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
 class BaseStationMixin(ListAPIView):
-    """Mixin for apiview stations."""
+    """
+    Mixin for apiview stations. The pagination query parameter picks
+    numbered pages (page, by default), cursor pages (cursor) or one
+    streamed list of every station (all).
+    """
 
-    pagination_class = StationPaginate
+    pagination_classes = {
+        'page': StationPaginate,
+        'cursor': StationCursorPaginate,
+    }
     serializer_class = None
-    queryset = None
+    dataset = None
     city_field = None
 
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            request = getattr(self, 'request', None)
+            mode = request and request.query_params.get('pagination')
+            pagination_class = self.pagination_classes.get(
+                mode,
+                StationPaginate,
+            )
+            self._paginator = pagination_class()
+        return self._paginator
+
     def get_queryset(self):
-        return self.queryset
+        store = get_store()
+        return Selection(store, store.get_positions(self.dataset))
 
     def get(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
+        """
+        Stations never change between deploys, so json pages are rendered
+        once per url (brand, city, page, page size and host of the links)
+        and media type, later requests get the cached bytes.
+        """
+        if request.query_params.get('pagination') == 'all':
+            return StreamingHttpResponse(
+                stream_json_list(self.stream_stations(request)),
+                content_type='application/json',
+            )
 
-        city = request.query_params.get('city')
-        if city:
-            filter_queryset = []
-            for station in queryset:
-                if city.title() in station[self.city_field]:
-                    filter_queryset.append(station)
-        else:
-            filter_queryset = queryset
+        renderer = request.accepted_renderer
+        if not isinstance(renderer, JSONRenderer):
+            return self.list_stations(request)
 
-        page = self.paginate_queryset(filter_queryset)
+        media_type = request.accepted_media_type
+        content = page_cache.get_or_set(
+            f'{self.dataset}:{media_type}:{request.build_absolute_uri()}',
+            lambda: renderer.render(
+                self.list_stations(request).data,
+                media_type,
+                self.get_renderer_context(),
+            ),
+        )
+        return HttpResponse(content, content_type=renderer.media_type)
+
+    def list_stations(self, request):
+        queryset = self.filter_stations(request)
+        page = self.paginate_queryset(queryset)
 
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -40,3 +162,36 @@ class BaseStationMixin(ListAPIView):
 
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
+
+    def stream_stations(self, request):
+        """Every station of the list, serialized in chunks."""
+        queryset = self.filter_stations(request)
+        for start in range(0, len(queryset), STREAM_CHUNK):
+            chunk = queryset[start:start + STREAM_CHUNK]
+            yield from self.get_serializer(chunk, many=True).data
+
+    def filter_stations(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        city = request.query_params.get('city')
+        if not city:
+            return queryset
+        if not TOKENS.search(city):
+            return Selection(queryset.stations, [])
+
+        filter_queryset = self.filter_city(queryset, city)
+        if not filter_queryset:
+            resolved = resolve_city(city)
+            if resolved:
+                filter_queryset = self.filter_city(queryset, resolved)
+        return filter_queryset
+
+    def filter_city(self, queryset, city):
+        """
+        Stations with a word of the city column starting with city.
+        Cyrillic is matched as written, Latin against transliterations.
+        """
+        latin = not CYRILLIC.search(city)
+        index = get_token_index(self.dataset, self.city_field, latin)
+        key = normalize(city) if latin else fold(city)
+        return Selection(queryset.stations, index.search(key))
@@ -1,9 +1,12 @@
 from datetime import timedelta, datetime, timezone
 from decimal import Decimal
 
+from django.conf import settings
+
 from rest_framework import serializers
 
 from fuels.models import Order, Fuel
+from fuels.utils import BRANDS
 
 
 class FuelSerializer(serializers.HyperlinkedModelSerializer):
@@ -53,50 +56,119 @@ class VerifyOrderSerializer(serializers.ModelSerializer):
 
 
 class WogSerializer(serializers.Serializer):
-    id = serializers.IntegerField()
+    id = serializers.IntegerField(source='ref')
     city = serializers.CharField()
-    name = serializers.CharField()
+    name = serializers.CharField(source='address')
     schedule = serializers.DictField()
-
-    url = serializers.SerializerMethodField()
-
-    def get_url(self, obj):
-        lat = obj['coordinates']['latitude']
-        lon = obj['coordinates']['longitude']
-        return f'https://www.google.com/maps/place/{lat},{lon}'
+    url = serializers.CharField()
 
 
 class OkkoSerializer(serializers.Serializer):
-    city = serializers.CharField(source='Naselenyy_punkt')
-    address = serializers.CharField(source='Adresa')
-    url = serializers.SerializerMethodField()
-
-    def get_url(self, obj):
-        lat = obj['coordinates']['lat']
-        lon = obj['coordinates']['lng']
-        return f'https://www.google.com/maps/place/{lat},{lon}'
+    city = serializers.CharField()
+    address = serializers.CharField()
+    url = serializers.CharField()
 
 
 class UkrnaftaSerializer(serializers.Serializer):
     address = serializers.CharField()
-    url = serializers.SerializerMethodField()
-
-    def get_url(self, obj):
-        lat = obj['location']['lat']
-        lon = obj['location']['lng']
-        return f'https://www.google.com/maps/place/{lat},{lon}'
+    url = serializers.CharField()
 
 
 class AnpSerializer(serializers.Serializer):
-    region = serializers.CharField(source='Область')
-    district = serializers.CharField(source='Район')
-    address = serializers.CharField(source='Адреса')
-    url = serializers.SerializerMethodField()
-
-    def get_url(self, obj):
-        lat = obj['Широта']
-        lon = obj['Довгота']
-        return f'https://www.google.com/maps/place/{lat},{lon}'
+    region = serializers.CharField()
+    district = serializers.CharField(source='city')
+    address = serializers.CharField()
+    url = serializers.CharField()
+
+
+class NearestStationsSerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lon = serializers.FloatField(min_value=-180, max_value=180)
+    k = serializers.IntegerField(default=10, min_value=1, max_value=50)
+    brand = serializers.MultipleChoiceField(choices=BRANDS, required=False)
+    max_distance = serializers.FloatField(
+        required=False,
+        min_value=0,
+        max_value=1000,
+    )
+
+
+class StationAreaSerializer(serializers.Serializer):
+    """A map viewport (south, west, north, east) or a circle around a point."""
+
+    south = serializers.FloatField(required=False, min_value=-90, max_value=90)
+    west = serializers.FloatField(
+        required=False,
+        min_value=-180,
+        max_value=180,
+    )
+    north = serializers.FloatField(required=False, min_value=-90, max_value=90)
+    east = serializers.FloatField(
+        required=False,
+        min_value=-180,
+        max_value=180,
+    )
+    lat = serializers.FloatField(required=False, min_value=-90, max_value=90)
+    lon = serializers.FloatField(
+        required=False,
+        min_value=-180,
+        max_value=180,
+    )
+    radius = serializers.FloatField(
+        required=False,
+        min_value=0.1,
+        max_value=1000,
+    )
+    brand = serializers.MultipleChoiceField(choices=BRANDS, required=False)
+    limit = serializers.IntegerField(
+        default=settings.STATIONS_AREA_LIMIT,
+        min_value=1,
+        max_value=2000,
+    )
+
+    def validate(self, data):
+        """Sets mode to box or circle, the other one must not be given."""
+        box = [data.get(key) for key in ['south', 'west', 'north', 'east']]
+        circle = [data.get(key) for key in ['lat', 'lon', 'radius']]
+        if None not in box and circle == [None] * 3:
+            if box[0] >= box[2] or box[1] >= box[3]:
+                raise serializers.ValidationError(
+                    'south/west must be less than north/east',
+                )
+            data['mode'] = 'box'
+        elif None not in circle and box == [None] * 4:
+            data['mode'] = 'circle'
+        else:
+            raise serializers.ValidationError(
+                'either south, west, north and east or lat, lon and radius '
+                'are required',
+            )
+        return data
+
+
+class StationClustersSerializer(serializers.Serializer):
+    south = serializers.FloatField(min_value=-90, max_value=90)
+    west = serializers.FloatField(min_value=-180, max_value=180)
+    north = serializers.FloatField(min_value=-90, max_value=90)
+    east = serializers.FloatField(min_value=-180, max_value=180)
+    zoom = serializers.IntegerField(min_value=0, max_value=22)
+
+    def validate(self, data):
+        if data['south'] >= data['north'] or data['west'] >= data['east']:
+            raise serializers.ValidationError(
+                'south/west must be less than north/east',
+            )
+        return data
+
+
+class StationSerializer(serializers.Serializer):
+    brand = serializers.CharField()
+    city = serializers.CharField()
+    address = serializers.CharField()
+    lat = serializers.FloatField()
+    lon = serializers.FloatField()
+    distance = serializers.FloatField()
+    url = serializers.CharField()
 
 
 class FuelPricesSerializer(serializers.Serializer):
@@ -0,0 +1,259 @@
+import re
+import json
+import threading
+import numpy as np
+
+from fuels.utils import (
+    BRANDS,
+    address_fields,
+    get_dataset,
+    get_location,
+    has_charger,
+)
+
+from users.geo import KM_PER_DEGREE, GridIndex
+
+
+# Field with the city of a station, ANP only has the district
+CITY_FIELDS = {
+    'wog': 'city',
+    'okko': 'Naselenyy_punkt',
+    'anp': 'Район',
+}
+REF_FIELDS = {
+    'wog': 'id',
+    'okko': 'Cod_AZK',
+    'ukrnafta': 'title',
+    'anp': '№ п.п.',
+}
+# Ukrnafta addresses start with the settlement: "м. Немирів, вул. ..."
+SETTLEMENT = re.compile(r'^(м\.|смт\.?|с\.|с-ще|селище)\s*')
+
+_store = None
+_station_indexes = {}
+_lock = threading.Lock()
+
+
+class StringTable:
+    """Every distinct string is kept once, columns hold its code."""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, code):
+        return self.values[code]
+
+    def add(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def get_city(brand, station):
+    if brand == 'ukrnafta':
+        settlement = station['address'].split(',')[0]
+        return SETTLEMENT.sub('', settlement).strip()
+    return station[CITY_FIELDS[brand]]
+
+
+class StationStore:
+    """
+    Stations of all brands in one schema: brand, ref (id of the station
+    at its brand), city, region, address, lat, lon, schedule, maps url
+    and whether it has an electric charger. Columns are numpy arrays,
+    texts are codes into string tables, rows are built only when read.
+    """
+
+    def __init__(self, brands):
+        self.strings = StringTable()
+        self.schedules = []
+        schedule_codes = {}
+
+        brand, refs, city, region, address = [], [], [], [], []
+        lat, lon, schedule, charger, urls = [], [], [], [], []
+        for code, (name, stations) in enumerate(brands.items()):
+            for station in stations:
+                brand.append(code)
+                refs.append(station[REF_FIELDS[name]])
+                city.append(self.strings.add(get_city(name, station)))
+                region.append(self.strings.add(station.get('Область', '')))
+                address.append(
+                    self.strings.add(station[address_fields[name]]),
+                )
+                position = get_location(name, station)
+                lat.append(position[0])
+                lon.append(position[1])
+                urls.append(
+                    'https://www.google.com/maps/place/'
+                    f'{position[0]},{position[1]}'
+                )
+                charger.append(has_charger(name, station))
+
+                key = json.dumps(station.get('schedule'), sort_keys=True)
+                if key not in schedule_codes:
+                    schedule_codes[key] = len(self.schedules)
+                    self.schedules.append(station.get('schedule'))
+                schedule.append(schedule_codes[key])
+
+        self.brands = list(brands)
+        self.brand = np.array(brand, dtype=np.int8)
+        self.refs = refs
+        self.city = np.array(city, dtype=np.int32)
+        self.region = np.array(region, dtype=np.int32)
+        self.address = np.array(address, dtype=np.int32)
+        self.lat = np.array(lat, dtype=np.float64)
+        self.lon = np.array(lon, dtype=np.float64)
+        self.schedule = np.array(schedule, dtype=np.int16)
+        self.charger = np.array(charger, dtype=bool)
+        self.urls = urls
+        self.positions = {
+            name: np.flatnonzero(self.brand == code).tolist()
+            for code, name in enumerate(self.brands)
+        }
+
+    def __len__(self):
+        return len(self.brand)
+
+    def __getitem__(self, position):
+        """One station as a dict."""
+        return {
+            'brand': self.brands[self.brand[position]],
+            'ref': self.refs[position],
+            'city': self.strings[self.city[position]],
+            'region': self.strings[self.region[position]],
+            'address': self.strings[self.address[position]],
+            'lat': float(self.lat[position]),
+            'lon': float(self.lon[position]),
+            'schedule': self.schedules[self.schedule[position]],
+            'url': self.urls[position],
+        }
+
+    def get_positions(self, brand=None):
+        """Positions of the stations of a brand, or of all stations."""
+        if brand is None:
+            return range(len(self))
+        return self.positions[brand]
+
+    def get_texts(self, column, positions):
+        """Values of a text column (city, region, address) at positions."""
+        codes = getattr(self, column)[positions].tolist()
+        return [self.strings[code] for code in codes]
+
+
+def get_store():
+    """
+    Station store of all brands, built once. The json datasets are only
+    read for it, not kept in memory.
+    """
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = StationStore({
+                    brand: get_dataset(brand).read() for brand in BRANDS
+                })
+    return _store
+
+
+def get_station_index(brand=None):
+    """
+    Grid index over the stations of a brand or of all brands, built once.
+    Point ids of the index are indices into get_positions(brand).
+    """
+    if brand not in _station_indexes:
+        store = get_store()
+        positions = store.get_positions(brand)
+        _station_indexes[brand] = GridIndex(
+            store.lat[positions],
+            store.lon[positions],
+            cell=0.25,
+        )
+    return _station_indexes[brand]
+
+
+def nearest_stations(lat, lon, k=10, brands=None, max_distance=None):
+    """
+    Store positions and distances (km) of the k nearest stations of some
+    brands (all by default), nearest first.
+    """
+    store = get_store()
+    found = []
+    for brand in brands or [None]:
+        positions = store.get_positions(brand)
+        points, distances = get_station_index(brand).nearest(
+            lat, lon, k, max_distance,
+        )
+        found.extend(zip(
+            [positions[point] for point in points.tolist()],
+            distances.tolist(),
+        ))
+    return sorted(found, key=lambda item: item[1])[:k]
+
+
+def find_stations(query, brands=None):
+    """
+    Store positions, in order, of the stations a query of the grid index
+    returns, over the indexes of some brands (all by default).
+    """
+    store = get_store()
+    found = [
+        np.asarray(store.get_positions(brand))[query(get_station_index(brand))]
+        for brand in brands or [None]
+    ]
+    return np.sort(np.concatenate(found))
+
+
+def stations_in_box(south, west, north, east, brands=None):
+    """Store positions of the stations inside a lat/lon rectangle."""
+    return find_stations(
+        lambda index: index.in_box(south, west, north, east),
+        brands,
+    )
+
+
+def stations_within(lat, lon, radius, brands=None):
+    """Store positions of the stations within radius km of a point."""
+    return find_stations(
+        lambda index: index.within(lat, lon, radius)[0],
+        brands,
+    )
+
+
+def get_circle_box(lat, lon, radius):
+    """South, west, north and east of a rectangle around a circle."""
+    dlat = radius / KM_PER_DEGREE
+    top = np.radians(min(abs(lat) + dlat, 89.9))
+    dlon = min(radius / (KM_PER_DEGREE * np.cos(top)), 180)
+    return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+
+
+def cluster_stations(positions, south, west, north, east, cells=16):
+    """
+    Group stations into a cells x cells grid over a rectangle.
+    Returns centroid latitudes, longitudes and counts of non-empty cells.
+    """
+    store = get_store()
+    lat, lon = store.lat[positions], store.lon[positions]
+    rows = np.clip(
+        ((lat - south) / (north - south) * cells).astype(int), 0, cells - 1,
+    )
+    cols = np.clip(
+        ((lon - west) / (east - west) * cells).astype(int), 0, cells - 1,
+    )
+    keys = rows * cells + cols
+    counts = np.bincount(keys, minlength=cells * cells)
+    filled = np.flatnonzero(counts)
+    counts = counts[filled]
+    return (
+        np.bincount(keys, weights=lat, minlength=cells * cells)[filled] /
+        counts,
+        np.bincount(keys, weights=lon, minlength=cells * cells)[filled] /
+        counts,
+        counts,
+    )
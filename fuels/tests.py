@@ -1,10 +1,35 @@
+import re
+import json
+import pickle
+import hashlib
+import tempfile
+import numpy as np
+
+from pathlib import Path
+
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
 
 from rest_framework.test import APITestCase
-from rest_framework.status import HTTP_201_CREATED, HTTP_200_OK
+from rest_framework.status import (
+    HTTP_200_OK,
+    HTTP_201_CREATED,
+    HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
+)
 
-from fuels.utils import wog, okko, anp, ukr
+from drive_hub.datasets import Dataset
+from fuels.clusters import get_cluster_levels, get_clusters
+from fuels.indexes import Selection, get_token_index
+from fuels.stations import (
+    cluster_stations,
+    get_store,
+    nearest_stations,
+    stations_in_box,
+    stations_within,
+)
+from fuels.utils import get_location, get_stations
 from fuels.models import Order, Fuel
 from fuels.serializers import (
     FuelSerializer, 
@@ -16,6 +41,8 @@ from fuels.serializers import (
 )
 from users.models import Achievement, UserAchievement, Comment, Rating
 from users.serializers import CommentSerializer
+from users.cities import fold, normalize
+from users.geo import haversine
 
 
 User = get_user_model()
@@ -106,24 +133,360 @@ class OrderTest(APITestCase):
 
 
 class StationsTest(APITestCase):
-    def list_ser(self, url, data, serializer_class):
+    def list_ser(self, url, brand, serializer_class):
         response = self.client.get(reverse(url))
-        serializer = serializer_class(data[:10], many=True)
+        store = get_store()
+        stations = [store[i] for i in store.get_positions(brand)[:10]]
+        serializer = serializer_class(stations, many=True)
         self.assertEqual(response.status_code, HTTP_200_OK)
-        self.assertEqual(response.data['results'], serializer.data)
+        self.assertEqual(response.json()['results'], serializer.data)
 
     def test_wog(self):
         url = 'wog_stations'
-        self.list_ser(url, wog, WogSerializer)
+        self.list_ser(url, 'wog', WogSerializer)
 
     def test_okko(self):
         url = 'okko_stations'
-        self.list_ser(url, okko, OkkoSerializer)
+        self.list_ser(url, 'okko', OkkoSerializer)
 
     def test_ukr(self):
         url = 'ukrnafta_stations'
-        self.list_ser(url, ukr, UkrnaftaSerializer)
+        self.list_ser(url, 'ukrnafta', UkrnaftaSerializer)
 
     def test_anp(self):
         url = 'anp_stations'
-        self.list_ser(url, anp, AnpSerializer)
+        self.list_ser(url, 'anp', AnpSerializer)
+
+    def test_cached_pages(self):
+        url = reverse('okko_stations')
+        first = self.client.get(url, {'city': 'Lviv', 'page_size': 5})
+        second = self.client.get(url, {'city': 'Lviv', 'page_size': 5})
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(len(second.json()['results']), 5)
+
+        response = self.client.get(url, {'page': 1000})
+        self.assertEqual(response.status_code, HTTP_404_NOT_FOUND)
+
+    def test_cursor_pages(self):
+        url = reverse('ukrnafta_stations')
+        pages = self.client.get(url, {'page_size': 50}).json()
+        response = self.client.get(
+            url, {'pagination': 'cursor', 'page_size': 20},
+        )
+        cursor_pages = response.json()['results']
+        next_page = self.client.get(response.json()['next']).json()
+        cursor_pages += next_page['results']
+        self.assertEqual(cursor_pages[:40], pages['results'][:40])
+        self.assertIsNotNone(next_page['previous'])
+
+        response = self.client.get(
+            url, {'pagination': 'cursor', 'cursor': 'invalid'},
+        )
+        self.assertEqual(response.status_code, HTTP_404_NOT_FOUND)
+
+    def test_all_stations(self):
+        url = reverse('okko_stations')
+        response = self.client.get(url, {'pagination': 'all', 'city': 'Kyiv'})
+        stations = json.loads(b''.join(response.streaming_content))
+        count = self.client.get(url, {'city': 'Kyiv'}).json()['count']
+        self.assertEqual(len(stations), count)
+
+    def test_nearest(self):
+        response = self.client.get(
+            reverse('stations_nearest'),
+            {'lat': 50.45, 'lon': 30.52, 'k': 5, 'brand': ['wog', 'anp']},
+        )
+        self.assertEqual(response.status_code, HTTP_200_OK)
+        self.assertEqual(len(response.data), 5)
+        distances = [station['distance'] for station in response.data]
+        self.assertEqual(distances, sorted(distances))
+        for station in response.data:
+            self.assertIn(station['brand'], ['wog', 'anp'])
+
+    def test_area(self):
+        url = reverse('stations_area')
+        response = self.client.get(url, {
+            'south': 50.4, 'west': 30.4, 'north': 50.5, 'east': 30.6,
+        })
+        self.assertEqual(response.status_code, HTTP_200_OK)
+        self.assertFalse(response.data['clustered'])
+        self.assertEqual(
+            len(response.data['stations']), response.data['count'],
+        )
+
+        response = self.client.get(url, {
+            'lat': 49, 'lon': 31, 'radius': 1000, 'limit': 100,
+        })
+        self.assertTrue(response.data['clustered'])
+        self.assertEqual(
+            sum(cluster[2] for cluster in response.data['clusters']),
+            response.data['count'],
+        )
+
+        for params in [
+            {'south': 50, 'lat': 50, 'lon': 30, 'radius': 10},
+            {'south': 50, 'west': 30, 'north': 51},
+            {'lat': 50, 'lon': 30},
+        ]:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, HTTP_400_BAD_REQUEST)
+
+    def test_clusters(self):
+        response = self.client.get(reverse('stations_clusters'), {
+            'south': 44, 'west': 22, 'north': 53, 'east': 41, 'zoom': 5,
+        })
+        self.assertEqual(response.status_code, HTTP_200_OK)
+        for lat, lon, count, brands in response.data['clusters']:
+            self.assertEqual(sum(brands.values()), count)
+
+    def test_city_filter(self):
+        response = self.client.get(
+            reverse('okko_stations'), {'city': 'Kyiv'}
+        )
+        self.assertEqual(response.status_code, HTTP_200_OK)
+        self.assertGreater(response.json()['count'], 0)
+        for station in response.json()['results']:
+            self.assertIn('Київ', station['city'])
+
+    def test_city_filter_word_start(self):
+        store = get_store()
+        for name, city, other in [
+            ('anp_stations', 'Черні', 'Черняхівський'),
+            ('okko_stations', 'Дніпро', 'Придніпровське'),
+            ('ukrnafta_stations', 'Дніпро', 'Придніпровське'),
+        ]:
+            response = self.client.get(
+                reverse(name), {'city': city, 'pagination': 'all'},
+            )
+            stations = json.loads(b''.join(response.streaming_content))
+            self.assertGreater(len(stations), 0)
+            for station in stations:
+                self.assertNotIn(other, station.get('city', ''))
+                self.assertNotIn(other, station['address'])
+
+        url = reverse('anp_stations')
+        count = self.client.get(url, {'city': 'ки'}).json()['count']
+        anp = store.get_texts('city', store.get_positions('anp'))
+        self.assertEqual(count, sum('Ки' in city for city in anp))
+
+    def test_city_filter_no_words(self):
+        for city in ['---', "'", ' ']:
+            response = self.client.get(
+                reverse('okko_stations'), {'city': city},
+            )
+            self.assertEqual(response.status_code, HTTP_200_OK)
+            self.assertEqual(response.json()['count'], 0)
+
+
+class DatasetTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.path = self.directory / 'stations.json'
+        self.path.write_text(json.dumps([{'city': 'Lviv'}]))
+
+    def test_loaded_on_access(self):
+        dataset = Dataset('stations', self.path)
+        self.assertFalse(dataset.loaded)
+        self.assertEqual(dataset.read(), [{'city': 'Lviv'}])
+        self.assertFalse(dataset.loaded)
+        self.assertIs(dataset.data, dataset.data)
+        self.assertTrue(dataset.loaded)
+
+    def test_digest(self):
+        dataset = Dataset('stations', self.path)
+        self.assertEqual(
+            dataset.get_digest(),
+            hashlib.sha1(self.path.read_bytes()).hexdigest(),
+        )
+        self.assertFalse(dataset.loaded)
+
+    def test_cache_file(self):
+        with override_settings(DATASETS_CACHE_DIR=self.directory / 'cache'):
+            dataset = Dataset('stations', self.path)
+            dataset.data
+            cache_path = dataset.get_cache_path()
+            self.assertTrue(cache_path.exists())
+
+            # later processes read the pickle instead of the json
+            with open(cache_path, 'wb') as f:
+                pickle.dump(['cached'], f)
+            self.assertEqual(Dataset('stations', self.path).data, ['cached'])
+
+
+class StationStoreTest(SimpleTestCase):
+    def test_rows_match_datasets(self):
+        store = get_store()
+        for brand in ['wog', 'okko', 'ukrnafta', 'anp']:
+            stations = get_stations(brand)
+            positions = store.get_positions(brand)
+            self.assertEqual(len(positions), len(stations))
+            for position, station in zip(positions[::50], stations[::50]):
+                row = store[position]
+                self.assertEqual(row['brand'], brand)
+                self.assertEqual(
+                    (row['lat'], row['lon']),
+                    get_location(brand, station),
+                )
+
+    def test_serializers_keep_output(self):
+        store = get_store()
+        wog = get_stations('wog')[0]
+        self.assertEqual(
+            WogSerializer(store[store.get_positions('wog')[0]]).data,
+            {
+                'id': wog['id'],
+                'city': wog['city'],
+                'name': wog['name'],
+                'schedule': wog['schedule'],
+                'url': 'https://www.google.com/maps/place/{},{}'.format(
+                    wog['coordinates']['latitude'],
+                    wog['coordinates']['longitude'],
+                ),
+            },
+        )
+        anp = get_stations('anp')[0]
+        self.assertEqual(
+            AnpSerializer(store[store.get_positions('anp')[0]]).data,
+            {
+                'region': anp['Область'],
+                'district': anp['Район'],
+                'address': anp['Адреса'],
+                'url': 'https://www.google.com/maps/place/{},{}'.format(
+                    anp['Широта'], anp['Довгота'],
+                ),
+            },
+        )
+
+
+class NearestStationsTest(SimpleTestCase):
+    def brute_force(self, lat, lon, k, brands=None, max_distance=None):
+        store = get_store()
+        distances = haversine(lat, lon, store.lat, store.lon).tolist()
+        found = sorted(
+            (distance, position)
+            for position, distance in enumerate(distances)
+            if (not brands or store[position]['brand'] in brands) and
+            (max_distance is None or distance <= max_distance)
+        )
+        return [position for _, position in found[:k]]
+
+    def test_same_as_scan(self):
+        for lat, lon, k, brands, max_distance in [
+            (50.45, 30.52, 10, None, None),
+            (49.84, 24.03, 3, ['okko'], None),
+            (46.48, 30.72, 20, ['wog', 'ukrnafta'], 15),
+            (44.0, 20.0, 5, None, 100),
+            (52.3, 33.1, 1, ['anp'], None),
+        ]:
+            found = nearest_stations(lat, lon, k, brands, max_distance)
+            self.assertEqual(
+                [position for position, _ in found],
+                self.brute_force(lat, lon, k, brands, max_distance),
+            )
+
+
+class StationAreaTest(SimpleTestCase):
+    def test_same_as_scan(self):
+        store = get_store()
+        lat, lon = store.lat, store.lon
+
+        found = stations_in_box(50.0, 30.0, 50.8, 31.0, ['okko', 'wog'])
+        expected = [
+            position for position in range(len(store))
+            if 50.0 <= lat[position] <= 50.8 and
+            30.0 <= lon[position] <= 31.0 and
+            store[position]['brand'] in ['okko', 'wog']
+        ]
+        self.assertEqual(found.tolist(), expected)
+
+        found = stations_within(49.84, 24.03, 25)
+        distances = haversine(49.84, 24.03, lat, lon)
+        self.assertEqual(
+            found.tolist(), np.flatnonzero(distances <= 25).tolist(),
+        )
+
+    def test_clusters(self):
+        positions = stations_in_box(44, 22, 53, 41)
+        lat, lon, counts = cluster_stations(positions, 44, 22, 53, 41)
+        self.assertEqual(counts.sum(), len(positions))
+        self.assertTrue(((44 <= lat) & (lat <= 53)).all())
+
+
+class ClusterLevelTest(SimpleTestCase):
+    def test_levels(self):
+        store = get_store()
+        previous = 0
+        for level in get_cluster_levels():
+            self.assertEqual(level.counts.sum(), len(store))
+            self.assertEqual(level.brand_counts.sum(), len(store))
+            # cells split in four at every next zoom
+            self.assertGreaterEqual(len(level), previous)
+            previous = len(level)
+
+    def test_viewport(self):
+        clusters = get_clusters(-85, -180, 85, 180, 0)
+        self.assertEqual(len(clusters), 1)
+        self.assertEqual(clusters[0][2], len(get_store()))
+
+        clusters = get_clusters(50.3, 30.2, 50.6, 30.8, 12)
+        for lat, lon, count, brands in clusters:
+            self.assertTrue(50.3 <= lat <= 50.6 and 30.2 <= lon <= 30.8)
+        self.assertEqual(
+            sum(count for _, _, count, _ in clusters),
+            len(stations_in_box(50.3, 30.2, 50.6, 30.8)),
+        )
+
+
+class TokenIndexTest(SimpleTestCase):
+    fields = {
+        'wog': ('city', 'city'),
+        'okko': ('city', 'Naselenyy_punkt'),
+        'ukrnafta': ('address', 'address'),
+        'anp': ('city', 'Район'),
+    }
+    queries = [
+        'Kyiv', 'kyi', 'Київ', 'Ivano-Frankivsk', 'вул. Шевченка',
+        'a/sh', ', ', 'skyi', '5', 'zzz',
+    ]
+
+    def test_same_as_loop(self):
+        store = get_store()
+        for brand, (column, field) in self.fields.items():
+            stations = get_stations(brand)
+            positions = store.get_positions(brand)
+            for latin, fold_key in [(True, normalize), (False, fold)]:
+                index = get_token_index(brand, column, latin)
+                for query in self.queries:
+                    key = fold_key(query)
+                    start = re.compile(r'(?<![^\W_])' + re.escape(key))
+                    expected = [
+                        position
+                        for position, station in zip(positions, stations)
+                        if start.search(fold_key(station[field]))
+                    ] if re.search(r'[^\W_]', key) else []
+                    self.assertEqual(index.search(key), expected)
+
+    def test_word_start(self):
+        index = get_token_index('anp', 'city', latin=False)
+        self.assertFalse([
+            position for position in index.search('черні')
+            if 'черняхів' in index.values[position]
+        ])
+        self.assertFalse(index.search(', '))
+
+    def test_tokens_by_trigram(self):
+        index = get_token_index('ukrnafta', 'address')
+        for piece in ['kyiv', 'ky', 'shevchenka', 'sh', 'ivska', 'zzz']:
+            self.assertEqual(
+                sorted(index.get_tokens(piece)),
+                sorted(token for token in index.tokens if piece in token),
+            )
+
+    def test_selection(self):
+        stations = get_store()
+        positions = get_token_index('okko', 'city').search('kyiv')
+        selection = Selection(stations, positions)
+        self.assertEqual(len(selection), len(positions))
+        self.assertEqual(selection[:2], [stations[i] for i in positions[:2]])
@@ -1,4 +1,4 @@
-import json
+from drive_hub.datasets import get_dataset, register
 
 
 paths = {
@@ -10,22 +10,62 @@ paths = {
 }
 
 
-with open(paths['wog'], 'r', encoding='utf-8') as f:
-    wog = json.load(f)
+BRANDS = ['wog', 'okko', 'ukrnafta', 'anp']
 
+# Names the datasets had when they were loaded at import time
+LEGACY_NAMES = {'ukr': 'ukrnafta'}
 
-with open(paths['okko'], 'r', encoding='utf-8') as f:
-    data = json.load(f)
-    okko = [s['attributes'] for s in data]
 
+register('wog', paths['wog'])
+register(
+    'okko',
+    paths['okko'],
+    transform=lambda data: [s['attributes'] for s in data],
+)
+register('ukrnafta', paths['ukrnafta'])
+register('anp', paths['anp'])
+register('prices', paths['prices'])
 
-with open(paths['ukrnafta'], 'r', encoding='utf-8') as f:
-    ukr = json.load(f)
 
+def get_stations(brand):
+    """Stations of a brand, the file is parsed on first use."""
+    return get_dataset(brand).data
 
-with open(paths['anp'], 'r', encoding='utf-8') as f:
-    anp = json.load(f)
 
+def get_prices():
+    return get_dataset('prices').data
+
+
+def __getattr__(name):
+    """Old module level datasets (wog, okko, ukr, anp, prices)."""
+    name = LEGACY_NAMES.get(name, name)
+    if name in paths:
+        return get_dataset(name).data
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+address_fields = {
+    'wog': 'name',
+    'okko': 'Adresa',
+    'ukrnafta': 'address',
+    'anp': 'Адреса',
+}
+
+
+def get_location(brand, station):
+    """Latitude and longitude of a station of any brand."""
+    if brand == 'wog':
+        coordinates = station['coordinates']
+        return coordinates['latitude'], coordinates['longitude']
+    if brand == 'okko':
+        coordinates = station['coordinates']
+        return coordinates['lat'], coordinates['lng']
+    if brand == 'ukrnafta':
+        location = station['location']
+        return location['lat'], location['lng']
+    return station['Широта'], station['Довгота']
+
+
+def has_charger(brand, station):
+    return brand == 'okko' and bool(station['electric_chargings'])
 
-with open(paths['prices'], 'r', encoding='utf-8') as f:
-    prices = json.load(f)
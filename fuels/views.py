@@ -1,18 +1,30 @@
 import random
+import numpy as np
 
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 
 from rest_framework import mixins, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.viewsets import ReadOnlyModelViewSet, GenericViewSet
+from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import IsAuthenticated
 
 from fuels import serializers
-from fuels.utils import okko, wog, ukr, anp, prices
+from fuels.utils import get_prices
 from fuels.models import Order, Fuel
 from fuels.mixins import BaseStationMixin
+from fuels.clusters import get_clusters
+from fuels.stations import (
+    cluster_stations,
+    get_circle_box,
+    get_store,
+    nearest_stations,
+    stations_in_box,
+    stations_within,
+)
 
 from users.models import Rating
 from users.serializers import CommentSerializer, RatingSerializer
@@ -137,7 +149,7 @@ class FuelPricesAPIView(ListAPIView):
     serializer_class = serializers.FuelPricesSerializer
 
     def get_queryset(self):
-        return prices
+        return get_prices()
 
     def get(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
@@ -163,23 +175,129 @@ class FuelPricesAPIView(ListAPIView):
 
 class WogAPIView(BaseStationMixin):
     serializer_class = serializers.WogSerializer
-    queryset = wog
+    dataset = 'wog'
     city_field = 'city'
 
 
 class OkkoAPIView(BaseStationMixin):
     serializer_class = serializers.OkkoSerializer
-    queryset = okko
-    city_field = 'Naselenyy_punkt'
+    dataset = 'okko'
+    city_field = 'city'
 
 
 class UkrnaftaAPIView(BaseStationMixin):
     serializer_class = serializers.UkrnaftaSerializer
-    queryset = ukr
+    dataset = 'ukrnafta'
     city_field = 'address'
 
 
 class AnpAPIView(BaseStationMixin):
     serializer_class = serializers.AnpSerializer
-    queryset = anp
-    city_field = 'Район'
+    dataset = 'anp'
+    city_field = 'city'
+
+
+class NearestStationsAPIView(APIView):
+    """Show the stations nearest to a point, of any or some brands."""
+
+    def get(self, request, *args, **kwargs):
+        serializer = serializers.NearestStationsSerializer(
+            data=request.query_params,
+        )
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        store = get_store()
+        found = nearest_stations(
+            data['lat'],
+            data['lon'],
+            data['k'],
+            sorted(data.get('brand', [])),
+            data.get('max_distance'),
+        )
+        stations = [
+            {**store[position], 'distance': round(distance, 2)}
+            for position, distance in found
+        ]
+        return Response(
+            serializers.StationSerializer(stations, many=True).data,
+        )
+
+
+class StationAreaAPIView(APIView):
+    """
+    Show every station inside a map viewport or a radius, as rows of
+    values. Areas with more stations than the limit come as clusters.
+    """
+
+    def get(self, request, *args, **kwargs):
+        serializer = serializers.StationAreaSerializer(
+            data=request.query_params,
+        )
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        brands = sorted(data.get('brand', []))
+
+        if data['mode'] == 'box':
+            box = data['south'], data['west'], data['north'], data['east']
+            positions = stations_in_box(*box, brands)
+        else:
+            box = get_circle_box(data['lat'], data['lon'], data['radius'])
+            positions = stations_within(
+                data['lat'], data['lon'], data['radius'], brands,
+            )
+
+        if len(positions) > data['limit']:
+            lat, lon, counts = cluster_stations(
+                positions, *box, cells=settings.STATIONS_CLUSTER_GRID,
+            )
+            return Response({
+                'count': len(positions),
+                'clustered': True,
+                'fields': ['lat', 'lon', 'count'],
+                'clusters': list(zip(
+                    np.round(lat, 6).tolist(),
+                    np.round(lon, 6).tolist(),
+                    counts.tolist(),
+                )),
+            })
+
+        store = get_store()
+        return Response({
+            'count': len(positions),
+            'clustered': False,
+            'fields': ['brand', 'lat', 'lon', 'address'],
+            'stations': list(zip(
+                [store.brands[code] for code in store.brand[positions]],
+                store.lat[positions].tolist(),
+                store.lon[positions].tolist(),
+                store.get_texts('address', positions),
+            )),
+        })
+
+
+class StationClustersAPIView(APIView):
+    """
+    Show station clusters of a map viewport at a zoom level: centroid,
+    count and stations of every brand. Clusters are built once per zoom.
+    """
+
+    def get(self, request, *args, **kwargs):
+        serializer = serializers.StationClustersSerializer(
+            data=request.query_params,
+        )
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        clusters = get_clusters(
+            data['south'],
+            data['west'],
+            data['north'],
+            data['east'],
+            data['zoom'],
+        )
+        return Response({
+            'zoom': data['zoom'],
+            'fields': ['lat', 'lon', 'count', 'brands'],
+            'clusters': clusters,
+        })
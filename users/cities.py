@@ -0,0 +1,193 @@
+import re
+
+from functools import lru_cache
+
+from users.routes import get_cities
+
+
+# Ukrainian to Latin, official transliteration (KMU 2010), plus the few
+# Russian letters people still type
+TRANSLITERATION = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'h', 'ґ': 'g', 'д': 'd', 'е': 'e',
+    'є': 'ie', 'ж': 'zh', 'з': 'z', 'и': 'y', 'і': 'i', 'ї': 'i', 'й': 'i',
+    'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r',
+    'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch',
+    'ш': 'sh', 'щ': 'shch', 'ь': '', 'ю': 'iu', 'я': 'ia',
+    'ы': 'y', 'э': 'e', 'ё': 'e', 'ъ': '',
+}
+# Spelling at the start of a word
+INITIAL = {'є': 'ye', 'ї': 'yi', 'й': 'y', 'ю': 'yu', 'я': 'ya'}
+APOSTROPHES = re.compile('[\'’ʼ`]')
+SEPARATORS = re.compile(r'[\s\-‐–—]+')
+CYRILLIC = re.compile('[\u0400-\u04ff]')
+
+# Former and Russian names still in use, resolved like the city names
+ALIASES = {
+    'Kiev': 'Kyiv',
+    'Kharkov': 'Kharkiv',
+    'Odessa': 'Odesa',
+    'Dnepr': 'Dnipro',
+    'Dnepropetrovsk': 'Dnipro',
+    'Dnipropetrovsk': 'Dnipro',
+    'Nikolaev': 'Mykolaiv',
+    'Zaporozhye': 'Zaporizhzhia',
+    'Lvov': 'Lviv',
+    'Rovno': 'Rivne',
+    'Lugansk': 'Luhansk',
+    'Chernigov': 'Chernihiv',
+    'Uzhgorod': 'Uzhhorod',
+    'Dniprodzerzhynsk': 'Kamianske',
+    'Kirovohrad': 'Kropyvnytskyi',
+    'Kirovograd': 'Kropyvnytskyi',
+    'Artemivsk': 'Bakhmut',
+    'Krasnoarmiisk': 'Pokrovsk',
+    'Komsomolsk': 'Horishni Plavni',
+    'Dzerzhynsk': 'Toretsk',
+}
+
+# Suggestions returned by autocomplete when no limit is given
+AUTOCOMPLETE_LIMIT = 10
+
+_index = None
+
+
+@lru_cache(maxsize=8192)
+def fold(text):
+    """Casefolded text, no apostrophes, words separated by single spaces."""
+    text = APOSTROPHES.sub('', text.casefold())
+    return SEPARATORS.sub(' ', text).strip()
+
+
+@lru_cache(maxsize=8192)
+def normalize(text):
+    """Lookup key of a name: folded, Cyrillic transliterated to Latin."""
+    text = fold(text)
+    key = []
+    for i, char in enumerate(text):
+        if char == 'г' and i and text[i - 1] == 'з':
+            key.append('gh')
+        elif char in INITIAL and (i == 0 or not text[i - 1].isalpha()):
+            key.append(INITIAL[char])
+        else:
+            key.append(TRANSLITERATION.get(char, char))
+    return ''.join(key)
+
+
+def edit_distance(first, second, limit):
+    """
+    Damerau-Levenshtein distance (adjacent swaps count as one edit),
+    anything over limit is returned as limit + 1.
+    """
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    before = None
+    previous = list(range(len(second) + 1))
+    for i, a in enumerate(first, 1):
+        current = [i] + [0] * len(second)
+        for j, b in enumerate(second, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (a != b),
+            )
+            if (
+                i > 1 and j > 1 and
+                a == second[j - 2] and first[i - 2] == b
+            ):
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+def get_edit_limit(key):
+    """Edits allowed for a fuzzy match, longer names allow more."""
+    return 1 if len(key) <= 5 else 2 if len(key) <= 10 else 3
+
+
+class CityIndex:
+    """
+    Lookup of city names written in any case, in Latin or Cyrillic and
+    with typos. Keys go through normalize, prefixes of every word are
+    kept in a trie for autocomplete. Cities are ranked by population.
+    """
+
+    def __init__(self, cities, aliases=None):
+        ranked = sorted(
+            cities,
+            key=lambda city: -int(city.get('population') or 0),
+        )
+        self.names = [city['city'] for city in ranked]
+        self.regions = {
+            city['city']: city.get('admin_name') for city in ranked
+        }
+        self.keys = {}
+        self.trie = {}
+        for i, name in enumerate(self.names):
+            key = normalize(name)
+            self.keys.setdefault(key, i)
+            words = key.split(' ')
+            for start in range(len(words)):
+                self.insert(' '.join(words[start:]), i)
+        position = {name: i for i, name in enumerate(self.names)}
+        for alias, name in (aliases or {}).items():
+            if name in position:
+                self.keys.setdefault(normalize(alias), position[name])
+        # the fuzzy fallback is not that cheap, autocomplete runs it
+        # on every keystroke that leaves the trie
+        self.cached_resolve = lru_cache(maxsize=4096)(self.resolve)
+
+    def __len__(self):
+        return len(self.names)
+
+    def insert(self, key, city):
+        node = self.trie
+        for char in key:
+            node = node.setdefault(char, {})
+            # None holds the cities under this prefix, in population order
+            ids = node.setdefault(None, [])
+            if not ids or ids[-1] != city:
+                ids.append(city)
+
+    def resolve(self, text):
+        """Name of the city meant by text, None when nothing is close."""
+        key = normalize(text)
+        if not key:
+            return None
+        if key in self.keys:
+            return self.names[self.keys[key]]
+
+        # keys are in population order, so ties go to the larger city
+        best, found = get_edit_limit(key) + 1, None
+        for other, i in self.keys.items():
+            distance = edit_distance(key, other, best - 1)
+            if distance < best:
+                best, found = distance, i
+        return self.names[found] if found is not None else None
+
+    def autocomplete(self, text, limit=AUTOCOMPLETE_LIMIT):
+        """Cities with a word starting with text, largest first."""
+        node = self.trie
+        for char in normalize(text):
+            node = node.get(char)
+            if node is None:
+                city = self.cached_resolve(text)
+                return [city] if city else []
+        return [self.names[i] for i in node.get(None, [])[:limit]]
+
+    def get_region(self, name):
+        return self.regions.get(name)
+
+
+def get_city_index():
+    """City lookup index over cities.json, built once."""
+    global _index
+    if _index is None:
+        _index = CityIndex(get_cities(), ALIASES)
+    return _index
+
+
+def resolve_city(text):
+    """Cached CityIndex.resolve over cities.json."""
+    return get_city_index().cached_resolve(text)
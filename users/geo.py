@@ -0,0 +1,203 @@
+import numpy as np
+
+from collections import defaultdict
+
+
+# Mean Earth radius (IUGG), km
+EARTH_RADIUS = 6371.0088
+KM_PER_DEGREE = EARTH_RADIUS * np.pi / 180
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in km, works on scalars and numpy arrays.
+
+    Compared with the WGS84 geodesic used by geopy the spherical model is
+    off by at most 0.5% of the distance. For the cities dataset (Ukraine,
+    44-52N) the error stays within 0.35% and under 4 km for any pair.
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2 +
+        np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def distance_matrix(lat, lon, other_lat=None, other_lon=None):
+    """Distances in km between every pair of points, one numpy pass."""
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if other_lat is None:
+        other_lat, other_lon = lat, lon
+    else:
+        other_lat = np.asarray(other_lat, dtype=np.float64)
+        other_lon = np.asarray(other_lon, dtype=np.float64)
+    return haversine(
+        lat[:, np.newaxis],
+        lon[:, np.newaxis],
+        other_lat[np.newaxis, :],
+        other_lon[np.newaxis, :],
+    )
+
+
+class GridIndex:
+    """
+    Uniform lat/lon grid over points, answers radius and nearest
+    neighbour queries by looking only at the surrounding cells.
+    """
+
+    def __init__(self, lat, lon, cell=0.5):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.cell = cell
+
+        rows = np.floor(self.lat / cell).astype(int)
+        cols = np.floor(self.lon / cell).astype(int)
+        cells = defaultdict(list)
+        for i, key in enumerate(zip(rows.tolist(), cols.tolist())):
+            cells[key].append(i)
+        self.cells = {key: np.array(value) for key, value in cells.items()}
+        self.bounds = (rows.min(), rows.max(), cols.min(), cols.max())
+
+    def __len__(self):
+        return len(self.lat)
+
+    def get_cell(self, lat, lon):
+        return int(np.floor(lat / self.cell)), int(np.floor(lon / self.cell))
+
+    def get_points(self, row_min, row_max, col_min, col_max):
+        """Indices of points in a rectangle of cells."""
+        area = (row_max - row_min + 1) * (col_max - col_min + 1)
+        if area > len(self.cells):
+            keys = [
+                key for key in self.cells
+                if row_min <= key[0] <= row_max and
+                col_min <= key[1] <= col_max
+            ]
+        else:
+            keys = [
+                (row, col)
+                for row in range(row_min, row_max + 1)
+                for col in range(col_min, col_max + 1)
+                if (row, col) in self.cells
+            ]
+        if not keys:
+            return np.empty(0, dtype=int)
+        return np.concatenate([self.cells[key] for key in keys])
+
+    def in_box(self, south, west, north, east):
+        """Indices of points inside a lat/lon rectangle, in order."""
+        row_min, col_min = self.get_cell(south, west)
+        row_max, col_max = self.get_cell(north, east)
+        points = self.get_points(row_min, row_max, col_min, col_max)
+        lat, lon = self.lat[points], self.lon[points]
+        inside = (
+            (south <= lat) & (lat <= north) & (west <= lon) & (lon <= east)
+        )
+        return np.sort(points[inside])
+
+    def within(self, lat, lon, radius):
+        """Indices and distances of points within radius km, nearest first."""
+        dlat = radius / KM_PER_DEGREE
+        top = np.radians(min(abs(lat) + dlat, 89.9))
+        dlon = min(radius / (KM_PER_DEGREE * np.cos(top)), 180)
+        row_min, col_min = self.get_cell(lat - dlat, lon - dlon)
+        row_max, col_max = self.get_cell(lat + dlat, lon + dlon)
+
+        points = self.get_points(row_min, row_max, col_min, col_max)
+        distances = haversine(lat, lon, self.lat[points], self.lon[points])
+        inside = distances <= radius
+        points, distances = points[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')
+        return points[order], distances[order]
+
+    def nearest(self, lat, lon, k=1, max_distance=None):
+        """Indices and distances of the k nearest points, nearest first."""
+        row, col = self.get_cell(lat, lon)
+        row_min, row_max, col_min, col_max = self.bounds
+        ring = 0
+        while True:
+            points = self.get_points(
+                row - ring, row + ring, col - ring, col + ring,
+            )
+            distances = haversine(
+                lat, lon, self.lat[points], self.lon[points],
+            )
+            # every point outside the searched cells is at least that far
+            south = (row - ring) * self.cell
+            north = (row + ring + 1) * self.cell
+            west = (col - ring) * self.cell
+            east = (col + ring + 1) * self.cell
+            top = np.radians(min(max(abs(south), abs(north)), 89.9))
+            covered = min(
+                (lat - south) * KM_PER_DEGREE,
+                (north - lat) * KM_PER_DEGREE,
+                (lon - west) * KM_PER_DEGREE * np.cos(top),
+                (east - lon) * KM_PER_DEGREE * np.cos(top),
+            )
+
+            found = len(points) >= k and (
+                np.partition(distances, k - 1)[k - 1] <= covered
+            )
+            everything = (
+                row - ring <= row_min and row + ring >= row_max and
+                col - ring <= col_min and col + ring >= col_max
+            )
+            far_enough = max_distance is not None and covered >= max_distance
+            if found or everything or far_enough:
+                break
+            ring += 1
+
+        if max_distance is not None:
+            inside = distances <= max_distance
+            points, distances = points[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')[:k]
+        return points[order], distances[order]
+
+    def near_segment(self, lat1, lon1, lat2, lon2, width):
+        """
+        Points within width km of the segment between two points: indices,
+        distances to the segment and positions along it (0 to 1).
+        """
+        dlat = width / KM_PER_DEGREE
+        top = np.radians(min(max(abs(lat1), abs(lat2)) + dlat, 89.9))
+        dlon = min(width / (KM_PER_DEGREE * np.cos(top)), 180)
+        row_min, col_min = self.get_cell(
+            min(lat1, lat2) - dlat, min(lon1, lon2) - dlon,
+        )
+        row_max, col_max = self.get_cell(
+            max(lat1, lat2) + dlat, max(lon1, lon2) + dlon,
+        )
+        points = self.get_points(row_min, row_max, col_min, col_max)
+
+        # local planar frame in km, precise enough between nearby cities
+        scale = KM_PER_DEGREE * np.cos(np.radians((lat1 + lat2) / 2))
+        end_x, end_y = (lon2 - lon1) * scale, (lat2 - lat1) * KM_PER_DEGREE
+        x = (self.lon[points] - lon1) * scale
+        y = (self.lat[points] - lat1) * KM_PER_DEGREE
+        length = end_x ** 2 + end_y ** 2
+        if length:
+            along = np.clip((x * end_x + y * end_y) / length, 0, 1)
+        else:
+            along = np.zeros(len(points))
+        distances = np.hypot(x - along * end_x, y - along * end_y)
+
+        inside = distances <= width
+        return points[inside], distances[inside], along[inside]
+
+
+def encode_polyline(lat, lon, precision=5):
+    """Line through the points in the encoded polyline format of Google."""
+    factor = 10 ** precision
+    points = np.column_stack([lat, lon]) * factor
+    points = np.round(points).astype(np.int64)
+    deltas = np.diff(points, axis=0, prepend=[[0, 0]]).ravel()
+    chunks = []
+    for value in deltas.tolist():
+        value = ~(value << 1) if value < 0 else value << 1
+        while value >= 0x20:
+            chunks.append(chr((0x20 | value & 0x1f) + 63))
+            value >>= 5
+        chunks.append(chr(value + 63))
+    return ''.join(chunks)
@@ -0,0 +1,122 @@
+import heapq
+import numpy as np
+
+
+class CSRGraph:
+    """
+    Undirected weighted graph stored as CSR arrays: neighbours of node i
+    are indices[indptr[i]:indptr[i + 1]] with the matching weights.
+    Nodes are integer ids, names maps them back to cities.
+    """
+
+    def __init__(self, indptr, indices, weights, names):
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.names = names
+        self.index = {name: i for i, name in enumerate(names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_graph(cls, graph, names):
+        """Convert a networkx graph, node ids follow the order of names."""
+        index = {name: i for i, name in enumerate(names)}
+        edges = np.array(
+            [
+                (index[u], index[v], weight)
+                for u, v, weight in graph.edges(data='weight')
+            ],
+            dtype=np.float64,
+        ).reshape(-1, 3)
+        sources = np.concatenate([edges[:, 0], edges[:, 1]]).astype(np.int32)
+        targets = np.concatenate([edges[:, 1], edges[:, 0]]).astype(np.int32)
+        weights = np.concatenate([edges[:, 2], edges[:, 2]])
+
+        order = np.argsort(sources, kind='stable')
+        counts = np.bincount(sources, minlength=len(names))
+        indptr = np.zeros(len(names) + 1, dtype=np.int32)
+        np.cumsum(counts, out=indptr[1:])
+        return cls(indptr, targets[order], weights[order], list(names))
+
+    def search(
+        self,
+        source,
+        target=None,
+        heuristic=None,
+        cutoff=None,
+        weights=None,
+    ):
+        """
+        Heap based Dijkstra from source, or A* when a heuristic (lower
+        bound of the distance to target for every node) is given.
+        weights may replace edge weights, as a list in CSR order.
+        Returns distances, predecessors and number of settled nodes.
+        """
+        size = len(self.names)
+        # plain lists are much faster to walk from python than numpy arrays
+        indptr = self.indptr.tolist()
+        indices = self.indices.tolist()
+        if weights is None:
+            weights = self.weights.tolist()
+
+        distances = [float('inf')] * size
+        predecessors = [-1] * size
+        settled = [False] * size
+        estimate = heuristic if heuristic is not None else [0.0] * size
+
+        distances[source] = 0.0
+        heap = [(estimate[source], 0.0, source)]
+        visited = 0
+        while heap:
+            _, distance, node = heapq.heappop(heap)
+            if settled[node]:
+                continue
+            settled[node] = True
+            visited += 1
+            if node == target:
+                break
+
+            for edge in range(indptr[node], indptr[node + 1]):
+                other = indices[edge]
+                new_distance = distance + weights[edge]
+                if cutoff is not None and new_distance > cutoff:
+                    continue
+                if new_distance < distances[other]:
+                    distances[other] = new_distance
+                    predecessors[other] = node
+                    heapq.heappush(
+                        heap,
+                        (new_distance + estimate[other], new_distance, other),
+                    )
+        return distances, predecessors, visited
+
+    def get_path(self, predecessors, source, target):
+        """Path of node ids rebuilt from the predecessors of a search."""
+        path = [target]
+        while path[-1] != source:
+            node = predecessors[path[-1]]
+            if node == -1:
+                return None
+            path.append(node)
+        return path[::-1]
+
+    def get_edges(self, path):
+        """CSR positions of the edges along a path, both directions."""
+        edges = []
+        for u, v in zip(path, path[1:]):
+            for a, b in [(u, v), (v, u)]:
+                start, end = self.indptr[a], self.indptr[a + 1]
+                row = self.indices[start:end].tolist()
+                edges.append(start + row.index(b))
+        return edges
+
+    def shortest_path(self, source, target, heuristic=None):
+        """Shortest way between two cities by name and its length."""
+        source, target = self.index[source], self.index[target]
+        distances, predecessors, _ = self.search(source, target, heuristic)
+        path = self.get_path(predecessors, source, target)
+        if path is None:
+            return None, float('inf')
+        return [self.names[i] for i in path], distances[target]
@@ -0,0 +1,183 @@
+import time
+import pickle
+import random
+import tracemalloc
+import numpy as np
+import networkx as nx
+
+from django.core.management.base import BaseCommand
+
+from geopy.distance import geodesic
+
+from users import routes
+from users.graph import CSRGraph
+
+
+def timeit(func, *args, repeat=3):
+    """Best wall time of a few runs, seconds, and the last result."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def measure_memory(func, *args):
+    """Memory held by the result of func, bytes."""
+    tracemalloc.start()
+    result = func(*args)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, result
+
+
+def legacy_routes(cities):
+    """Original builder: geopy distance for every pair in a longitude band."""
+    graph = nx.Graph()
+    for city in cities:
+        graph.add_node(city['city'])
+        from_coords = (float(city['lat']), float(city['lng']))
+        for other in cities:
+            to_coords = (float(other['lat']), float(other['lng']))
+            if abs(int(from_coords[1]) - int(to_coords[1])) < 2:
+                distance = geodesic(from_coords, to_coords).km + 10
+                graph.add_edge(
+                    city['city'],
+                    other['city'],
+                    weight=round(distance, 2),
+                )
+    return graph
+
+
+def bucket_routes(cities):
+    """Longitude band builder on top of the numpy distance matrix."""
+    lat, lon = routes.get_coordinates(cities)
+    distances = routes.distance_matrix(lat, lon)
+    names = [city['city'] for city in cities]
+    i, j = routes.get_candidates(lon)
+    graph = nx.Graph()
+    graph.add_nodes_from(names)
+    graph.add_weighted_edges_from(
+        (names[a], names[b], round(float(distances[a, b]) + 10, 2))
+        for a, b in zip(i.tolist(), j.tolist())
+    )
+    return graph
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the route graph'
+
+    builders = {
+        'legacy': legacy_routes,
+        'bucket': bucket_routes,
+        'spanner': routes.generate_routes,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'benchmark',
+            choices=['builders', 'backends', 'alternatives'],
+            nargs='?',
+            default='builders',
+        )
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        getattr(self, f'bench_{options["benchmark"]}')(options['repeat'])
+
+    def bench_builders(self, repeat):
+        straight = routes.get_distances()
+        self.stdout.write(
+            f'{"builder":<10}{"build ms":>10}{"edges":>8}'
+            f'{"dijkstra ms":>13}{"stretch":>9}{"max":>7}'
+        )
+        for name, builder in self.builders.items():
+            build, graph = timeit(
+                builder,
+                routes.get_cities(),
+                repeat=1 if name == 'legacy' else repeat,
+            )
+            start = time.perf_counter()
+            lengths = dict(nx.all_pairs_dijkstra_path_length(graph))
+            names = routes.get_names()
+            query = (time.perf_counter() - start) / len(names)
+
+            # road distance over straight-line distance, pairs over 100 km
+            i, j = np.nonzero(straight > 100)
+            road = np.array([
+                lengths[names[a]][names[b]]
+                for a, b in zip(i.tolist(), j.tolist())
+            ])
+            stretch = road / straight[i, j]
+            self.stdout.write(
+                f'{name:<10}{build * 1000:>10.1f}'
+                f'{graph.number_of_edges():>8}{query * 1000:>13.2f}'
+                f'{stretch.mean():>9.3f}{stretch.max():>7.2f}'
+            )
+
+    def bench_backends(self, repeat):
+        graph = routes.generate_routes(routes.get_cities())
+        data = pickle.dumps(graph, protocol=pickle.HIGHEST_PROTOCOL)
+        graph_memory, graph = measure_memory(pickle.loads, data)
+        csr_memory, csr = measure_memory(
+            CSRGraph.from_graph, graph, routes.get_names(),
+        )
+        csr_arrays = csr.indptr.nbytes + csr.indices.nbytes
+        csr_arrays += csr.weights.nbytes
+
+        random.seed(0)
+        pairs = [
+            random.sample(routes.get_names(), 2) for _ in range(500)
+        ]
+
+        def networkx_queries():
+            for source, target in pairs:
+                nx.single_source_dijkstra(graph, source, target)
+
+        def csr_queries():
+            for source, target in pairs:
+                csr.shortest_path(source, target)
+
+        networkx_time, _ = timeit(networkx_queries, repeat=repeat)
+        csr_time, _ = timeit(csr_queries, repeat=repeat)
+
+        self.stdout.write(f'{"backend":<10}{"memory KB":>11}{"query us":>10}')
+        self.stdout.write(
+            f'{"networkx":<10}{graph_memory / 1024:>11.1f}'
+            f'{networkx_time / len(pairs) * 1e6:>10.1f}'
+        )
+        self.stdout.write(
+            f'{"csr":<10}{csr_memory / 1024:>11.1f}'
+            f'{csr_time / len(pairs) * 1e6:>10.1f}'
+        )
+        self.stdout.write(f'csr arrays alone: {csr_arrays / 1024:.1f} KB')
+
+    def bench_alternatives(self, repeat):
+        random.seed(0)
+        pairs = [
+            random.sample(routes.get_names(), 2) for _ in range(100)
+        ]
+        routes.get_csr()
+
+        self.stdout.write(
+            f'{"k":<4}{"query ms":>10}{"max ms":>9}{"found":>8}{"longer":>9}'
+        )
+        for k in range(1, 6):
+            times, found, longer = [], [], []
+            for source, target in pairs:
+                best, paths = timeit(
+                    routes.alternative_paths,
+                    source,
+                    target,
+                    k,
+                    repeat=repeat,
+                )
+                times.append(best)
+                found.append(len(paths))
+                longer.append(paths[-1][1] / paths[0][1])
+            self.stdout.write(
+                f'{k:<4}{np.mean(times) * 1000:>10.2f}'
+                f'{np.max(times) * 1000:>9.2f}{np.mean(found):>8.2f}'
+                f'{np.mean(longer):>9.3f}'
+            )
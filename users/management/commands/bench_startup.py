@@ -0,0 +1,88 @@
+import os
+import sys
+import json
+import time
+import subprocess
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+# Every script runs in a fresh interpreter and prints its timings in
+# seconds as json, measured from before django.setup()
+SETUP = '''
+import json, time
+start = time.perf_counter()
+import django
+django.setup()
+timings = {}
+'''
+
+SCRIPTS = {
+    'web worker': SETUP + '''
+from django.urls import get_resolver
+from drive_hub.wsgi import application
+get_resolver().url_patterns
+timings['boot'] = time.perf_counter() - start
+
+from django.test import Client
+client = Client(SERVER_NAME='localhost')
+for name, url in [
+    ('first request', '/okko-stations/?city=Kyiv'),
+    ('second request', '/okko-stations/?city=Lviv'),
+]:
+    before = time.perf_counter()
+    response = client.get(url)
+    assert response.status_code == 200, response.status_code
+    timings[name] = time.perf_counter() - before
+print(json.dumps(timings))
+''',
+    'celery worker': SETUP + '''
+from drive_hub.celery import app
+app.loader.import_default_modules()
+timings['boot'] = time.perf_counter() - start
+print(json.dumps(timings))
+''',
+}
+
+
+def run(command, env):
+    """Wall time of a command in seconds and what it printed."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        command,
+        cwd=settings.BASE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return time.perf_counter() - start, result.stdout
+
+
+class Command(BaseCommand):
+    help = 'Measure startup time of manage.py, workers and first request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'drive_hub.settings'}
+        results = {}
+
+        for _ in range(options['repeat']):
+            wall, _ = run([sys.executable, 'manage.py', 'check'], env)
+            results.setdefault('manage.py check', []).append(wall)
+
+            for name, script in SCRIPTS.items():
+                wall, output = run([sys.executable, '-c', script], env)
+                results.setdefault(f'{name} process', []).append(wall)
+                for key, value in json.loads(output).items():
+                    results.setdefault(f'{name} {key}', []).append(value)
+
+        self.stdout.write(f'{"":<32}{"best ms":>10}{"worst ms":>10}')
+        for name, times in results.items():
+            self.stdout.write(
+                f'{name:<32}{min(times) * 1000:>10.1f}'
+                f'{max(times) * 1000:>10.1f}'
+            )
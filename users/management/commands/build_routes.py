@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from users import routes
+from users.graph import CSRGraph
+
+
+class Command(BaseCommand):
+    help = 'Build route artifacts for the current cities.json'
+
+    def handle(self, *args, **options):
+        graph = routes.generate_routes(routes.get_cities())
+        path = routes.save_graph(graph)
+        paths = routes.save_table(routes.build_table(graph))
+        csr = CSRGraph.from_graph(graph, routes.get_names())
+        paths += routes.save_csr(csr)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Route graph {routes.get_version()}: '
+                f'{graph.number_of_nodes()} cities, '
+                f'{graph.number_of_edges()} roads -> {path}'
+            )
+        )
+        for path in paths:
+            self.stdout.write(
+                self.style.SUCCESS(f'Route artifact -> {path}')
+            )
@@ -0,0 +1,457 @@
+import pickle
+import hashlib
+import threading
+import numpy as np
+import networkx as nx
+
+from pathlib import Path
+
+from django.conf import settings
+
+from drive_hub.datasets import get_dataset, register
+
+from users.geo import distance_matrix, haversine
+from users.graph import CSRGraph
+
+
+CITIES_PATH = 'staticfiles/json/cities.json'
+
+# Bump when the graph builder changes, so old artifacts are not reused.
+ROUTES_FORMAT = 4
+
+# A road of the graph is never longer than STRETCH times the direct road
+STRETCH = 1.05
+
+# Alternative routes: weight factor for roads already used, and the
+# share of an alternative allowed to run along a route found before
+PENALTY = 1.4
+MAX_OVERLAP = 0.7
+
+
+register('cities', CITIES_PATH)
+
+_lock = threading.RLock()
+_version = None
+_names = None
+_index = None
+_graph = None
+_distances = None
+_table = None
+_csr = None
+_coordinates = None
+
+
+def get_cities():
+    """The cities dataset, parsed on first use."""
+    return get_dataset('cities').data
+
+
+def get_version():
+    """Version of route artifacts: hash of cities.json and builder format."""
+    global _version
+    if _version is None:
+        digest = hashlib.sha1(get_dataset('cities').get_digest().encode())
+        digest.update(str(ROUTES_FORMAT).encode())
+        _version = digest.hexdigest()[:12]
+    return _version
+
+
+def get_names():
+    """City names, a position in this list is the id of a city."""
+    global _names, _index
+    if _names is None:
+        names = [city['city'] for city in get_cities()]
+        _index = {name: i for i, name in enumerate(names)}
+        _names = names
+    return _names
+
+
+def get_index():
+    """Id of every city by name."""
+    get_names()
+    return _index
+
+
+def get_coordinates(cities):
+    """Latitudes and longitudes of cities as numpy arrays."""
+    lat = np.array([float(city['lat']) for city in cities])
+    lon = np.array([float(city['lng']) for city in cities])
+    return lat, lon
+
+
+def get_city_coordinates():
+    """Coordinates of the cities dataset, parsed once."""
+    global _coordinates
+    if _coordinates is None:
+        _coordinates = get_coordinates(get_cities())
+    return _coordinates
+
+
+def get_distances():
+    """Straight-line city x city distance matrix, computed once."""
+    global _distances
+    if _distances is None:
+        _distances = distance_matrix(*get_city_coordinates())
+    return _distances
+
+
+def get_heuristic(to_city):
+    """
+    Straight-line distance from every city to to_city. A road is never
+    shorter than the straight line, so it is an admissible A* heuristic.
+    """
+    lat, lon = get_city_coordinates()
+    target = get_index()[to_city]
+    return haversine(lat[target], lon[target], lat, lon)
+
+
+def get_candidates(lon):
+    """
+    Pairs of cities whose integer longitudes differ by less than 2,
+    the roads of the dense graph, as two arrays of city ids.
+    """
+    band = lon.astype(int)
+    similar = np.abs(band[:, np.newaxis] - band[np.newaxis, :]) < 2
+    return np.nonzero(np.triu(similar, k=1))
+
+
+def generate_routes(cities, stretch=STRETCH):
+    """
+    Generate routes between cities as a greedy spanner of the dense graph:
+    its roads are taken shortest first, and a road is added only when the
+    way between its cities in the graph so far is over stretch times
+    longer. So no shortest way is over stretch times the dense one.
+    Shortest distances of the graph so far are a matrix, updated per road.
+    """
+    lat, lon = get_coordinates(cities)
+    names = [city['city'] for city in cities]
+    weights = np.round(distance_matrix(lat, lon) + 10, 2)
+    i, j = get_candidates(lon)
+    order = np.argsort(weights[i, j], kind='stable')
+
+    found = np.full(weights.shape, np.inf)
+    np.fill_diagonal(found, 0)
+    routes = nx.Graph()
+    routes.add_nodes_from(names)
+    for a, b in zip(i[order].tolist(), j[order].tolist()):
+        weight = float(weights[a, b])
+        if found[a, b] <= stretch * weight:
+            continue
+        routes.add_edge(names[a], names[b], weight=weight)
+        through = np.minimum(
+            found[:, a, np.newaxis] + weight + found[np.newaxis, b, :],
+            found[:, b, np.newaxis] + weight + found[np.newaxis, a, :],
+        )
+        np.minimum(found, through, out=found)
+
+    connect_components(routes, names, lat, lon)
+    return routes
+
+
+def connect_components(routes, names, lat, lon):
+    """Link isolated groups of cities by their closest pair of cities."""
+    components = list(nx.connected_components(routes))
+    while len(components) > 1:
+        inside = np.array([name in components[0] for name in names])
+        group, rest = np.nonzero(inside)[0], np.nonzero(~inside)[0]
+        distances = distance_matrix(
+            lat[group], lon[group], lat[rest], lon[rest],
+        )
+        a, b = np.unravel_index(np.argmin(distances), distances.shape)
+        routes.add_edge(
+            names[group[a]],
+            names[rest[b]],
+            weight=round(float(distances[a, b]) + 10, 2),
+        )
+        components = list(nx.connected_components(routes))
+
+
+def get_artifact_path(name, ext):
+    """Path of the prebuilt artifact for the current cities version."""
+    return Path(settings.ROUTES_DIR) / f'{name}-{get_version()}.{ext}'
+
+
+def save_graph(graph):
+    path = get_artifact_path('graph', 'pickle')
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as f:
+        pickle.dump(graph, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def load_graph():
+    path = get_artifact_path('graph', 'pickle')
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def get_graph():
+    """
+    Route graph shared by the whole process.
+    Loaded from the prebuilt artifact if it exists, otherwise built once.
+    """
+    global _graph
+    if _graph is None:
+        with _lock:
+            if _graph is None:
+                graph = load_graph()
+                if graph is None:
+                    graph = generate_routes(get_cities())
+                _graph = graph
+    return _graph
+
+
+def build_table(graph):
+    """
+    All-pairs shortest distances and predecessor matrix (Floyd-Warshall).
+    predecessors[i, j] is the city before j on the way from i, -1 if none.
+    """
+    names = get_names()
+    dist = nx.to_numpy_array(graph, nodelist=names, nonedge=np.inf)
+    np.fill_diagonal(dist, 0)
+    size = len(names)
+    pred = np.where(
+        np.isfinite(dist),
+        np.arange(size, dtype=np.int16)[:, np.newaxis],
+        -1,
+    ).astype(np.int16)
+    np.fill_diagonal(pred, -1)
+
+    for k in range(size):
+        through = dist[:, k, np.newaxis] + dist[np.newaxis, k, :]
+        shorter = through < dist
+        dist = np.where(shorter, through, dist)
+        pred = np.where(shorter, pred[np.newaxis, k, :], pred)
+    return dist, pred
+
+
+def save_table(table):
+    paths = []
+    for name, array in zip(['distances', 'predecessors'], table):
+        path = get_artifact_path(name, 'npy')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(path, array)
+        paths.append(path)
+    return paths
+
+
+def load_table():
+    """Memory-map the prebuilt table, so workers share it via page cache."""
+    try:
+        return tuple(
+            np.load(get_artifact_path(name, 'npy'), mmap_mode='r')
+            for name in ['distances', 'predecessors']
+        )
+    except FileNotFoundError:
+        return None
+
+
+def get_table():
+    global _table
+    if _table is None:
+        with _lock:
+            if _table is None:
+                table = load_table()
+                if table is None:
+                    table = build_table(get_graph())
+                _table = table
+    return _table
+
+
+def table_path(from_city, to_city):
+    """Shortest way and its length, looked up in the all-pairs table."""
+    distances, predecessors = get_table()
+    index = get_index()
+    source, target = index[from_city], index[to_city]
+    distance = float(distances[source, target])
+    if distance == np.inf:
+        raise nx.NetworkXNoPath(f'No path between {from_city} and {to_city}')
+
+    path = [target]
+    while path[-1] != source:
+        path.append(int(predecessors[source, path[-1]]))
+    names = get_names()
+    return [names[i] for i in reversed(path)], distance
+
+
+def save_csr(csr):
+    paths = []
+    for name in ['indptr', 'indices', 'weights']:
+        path = get_artifact_path(f'csr-{name}', 'npy')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(path, getattr(csr, name))
+        paths.append(path)
+    return paths
+
+
+def load_csr():
+    try:
+        arrays = [
+            np.load(get_artifact_path(f'csr-{name}', 'npy'), mmap_mode='r')
+            for name in ['indptr', 'indices', 'weights']
+        ]
+    except FileNotFoundError:
+        return None
+    return CSRGraph(*arrays, get_names())
+
+
+def get_csr():
+    """
+    Compact CSR route graph, memory-mapped from the prebuilt artifact
+    or converted once from the networkx graph.
+    """
+    global _csr
+    if _csr is None:
+        with _lock:
+            if _csr is None:
+                csr = load_csr()
+                if csr is None:
+                    csr = CSRGraph.from_graph(get_graph(), get_names())
+                _csr = csr
+    return _csr
+
+
+def shortest_path(from_city, to_city, backend=None, algorithm=None):
+    """
+    Shortest way between two cities and its length. The backend is
+    the all-pairs 'table', or a search on the 'networkx' or 'csr' graph
+    with 'dijkstra' or 'astar'. Asking for an algorithm explicitly
+    always runs a search, on the csr graph if the backend is the table.
+    """
+    backend = backend or settings.ROUTES_BACKEND
+    if algorithm and backend == 'table':
+        backend = 'csr'
+    algorithm = algorithm or settings.ROUTES_ALGORITHM
+    if algorithm not in ['dijkstra', 'astar']:
+        raise ValueError(f'Unknown routes algorithm: {algorithm}')
+
+    if backend == 'table':
+        return table_path(from_city, to_city)
+    if backend == 'networkx':
+        graph = get_graph()
+        if algorithm == 'astar':
+            heuristic = get_heuristic(to_city)
+            index = get_index()
+            path = nx.astar_path(
+                G=graph,
+                source=from_city,
+                target=to_city,
+                heuristic=lambda city, _: heuristic[index[city]],
+            )
+            return path, nx.path_weight(graph, path, 'weight')
+        distance, path = nx.single_source_dijkstra(graph, from_city, to_city)
+        return path, distance
+    if backend == 'csr':
+        heuristic = None
+        if algorithm == 'astar':
+            heuristic = get_heuristic(to_city).tolist()
+        path, distance = get_csr().shortest_path(
+            from_city,
+            to_city,
+            heuristic,
+        )
+        if path is None:
+            raise nx.NetworkXNoPath(
+                f'No path between {from_city} and {to_city}'
+            )
+        return path, distance
+    raise ValueError(f'Unknown routes backend: {backend}')
+
+
+def single_source_routes(from_city, backend=None):
+    """Shortest distances and ways from one city to every other city."""
+    backend = backend or settings.ROUTES_BACKEND
+    if backend != 'csr':
+        return nx.single_source_dijkstra(get_graph(), from_city)
+
+    csr = get_csr()
+    source = csr.index[from_city]
+    found, predecessors, _ = csr.search(source)
+    distances, ways = {}, {}
+    for target, distance in enumerate(found):
+        if distance != float('inf'):
+            path = csr.get_path(predecessors, source, target)
+            distances[csr.names[target]] = distance
+            ways[csr.names[target]] = [csr.names[i] for i in path]
+    return distances, ways
+
+
+def alternative_paths(from_city, to_city, k=3, max_overlap=MAX_OVERLAP):
+    """
+    Up to k loopless ways between two cities, shortest first.
+    Penalty method: after each search the roads of the found way get
+    heavier, and a way is kept only if no more than max_overlap of its
+    length runs along ways kept before. At most 3 * k searches are run.
+    """
+    csr = get_csr()
+    source, target = csr.index[from_city], csr.index[to_city]
+    lengths = csr.weights.tolist()
+    weights = list(lengths)
+
+    found = []
+    for _ in range(3 * k):
+        _, predecessors, _ = csr.search(source, target, weights=weights)
+        path = csr.get_path(predecessors, source, target)
+        if path is None or len(path) < 2:
+            break
+
+        edges = csr.get_edges(path)
+        forward = edges[::2]
+        distance = sum(lengths[edge] for edge in forward)
+        roads = set(forward) | set(edges[1::2])
+        if all(
+            sum(lengths[edge] for edge in forward if edge in used)
+            <= max_overlap * distance
+            for _, _, used in found
+        ):
+            found.append((path, distance, roads))
+            if len(found) == k:
+                break
+
+        for edge in edges:
+            weights[edge] *= PENALTY
+
+    found.sort(key=lambda item: item[1])
+    return [
+        ([csr.names[i] for i in path], distance)
+        for path, distance, _ in found
+    ]
+
+
+def reachable_cities(from_city, max_distance, backend=None):
+    """Cities within max_distance km by road, single-source with a cutoff."""
+    backend = backend or settings.ROUTES_BACKEND
+    if backend == 'networkx':
+        return nx.single_source_dijkstra_path_length(
+            G=get_graph(),
+            source=from_city,
+            cutoff=max_distance,
+        )
+
+    csr = get_csr()
+    distances, _, _ = csr.search(csr.index[from_city], cutoff=max_distance)
+    return {
+        csr.names[i]: distance
+        for i, distance in enumerate(distances)
+        if distance <= max_distance
+    }
+
+
+def distance_rows(origins, destinations):
+    """Road distances from every origin to every destination, km."""
+    distances, _ = get_table()
+    index = get_index()
+    rows = [index[city] for city in origins]
+    columns = [index[city] for city in destinations]
+    return distances[np.ix_(rows, columns)]
+
+
+def leg_distances(way):
+    """Road distance of every leg along a way, km."""
+    distances, _ = get_table()
+    index = get_index()
+    ids = [index[city] for city in way]
+    return distances[ids[:-1], ids[1:]].tolist()
@@ -1,8 +1,10 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model, password_validation
 
 from rest_framework import serializers
 
-from users import models, utils
+from users import models
+from users.cities import resolve_city
 
 
 User = get_user_model()
@@ -113,17 +115,142 @@ class UserAchievementSerializer(serializers.ModelSerializer):
         exclude = ['user']
 
 
+class CityField(serializers.CharField):
+    """City name in any case, Latin or Cyrillic, typos allowed."""
+
+    default_error_messages = {
+        'unknown': '"{input}" is not a known city.',
+    }
+
+    def to_internal_value(self, data):
+        value = super().to_internal_value(data)
+        city = resolve_city(value)
+        if city is None:
+            self.fail('unknown', input=value)
+        return city
+
+
+class CityAutocompleteSerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=100)
+    limit = serializers.IntegerField(default=10, min_value=1, max_value=50)
+
+
 class RouteSerializer(serializers.Serializer):
-    from_city = serializers.ChoiceField(
-        choices=utils.get_cities(),
+    from_city = CityField(required=False)
+    to_city = CityField(required=False)
+    avg_speed = serializers.IntegerField(
+        default=80,
+        min_value=40,
+        max_value=130,
+    )
+    algorithm = serializers.ChoiceField(
+        choices=['dijkstra', 'astar'],
         required=False,
     )
-    to_city = serializers.ChoiceField(
-        choices=utils.get_cities(),
+    alternatives = serializers.IntegerField(
+        default=1,
+        min_value=1,
+        max_value=5,
+    )
+    max_overlap = serializers.FloatField(
+        default=0.7,
+        min_value=0.1,
+        max_value=1,
+    )
+    geometry = serializers.ChoiceField(
+        choices=['polyline', 'geojson'],
         required=False,
     )
+
+
+class RoutePairSerializer(serializers.Serializer):
+    from_city = CityField()
+    to_city = CityField()
+
+
+class RouteBatchSerializer(serializers.Serializer):
+    routes = serializers.ListField(
+        child=RoutePairSerializer(),
+        allow_empty=False,
+        max_length=1000,
+    )
+    avg_speed = serializers.IntegerField(
+        default=80,
+        min_value=40,
+        max_value=130,
+    )
+
+
+class DistanceMatrixSerializer(serializers.Serializer):
+    origins = serializers.ListField(
+        child=CityField(),
+        allow_empty=False,
+        max_length=settings.ROUTES_MATRIX_SIZE,
+    )
+    destinations = serializers.ListField(
+        child=CityField(),
+        allow_empty=False,
+        max_length=settings.ROUTES_MATRIX_SIZE,
+    )
     avg_speed = serializers.IntegerField(
         default=80,
         min_value=40,
         max_value=130,
     )
+
+
+class MultiStopSerializer(serializers.Serializer):
+    stops = serializers.ListField(
+        child=CityField(),
+        min_length=2,
+        max_length=100,
+    )
+    start = CityField(required=False)
+    round_trip = serializers.BooleanField(default=False)
+    avg_speed = serializers.IntegerField(
+        default=80,
+        min_value=40,
+        max_value=130,
+    )
+    geometry = serializers.ChoiceField(
+        choices=['polyline', 'geojson'],
+        required=False,
+    )
+
+
+class ReachableSerializer(serializers.Serializer):
+    city = CityField()
+    car = serializers.CharField(required=False)
+    distance = serializers.IntegerField(
+        required=False,
+        min_value=10,
+        max_value=2000,
+    )
+
+    def validate(self, data):
+        if not data.get('car') and not data.get('distance'):
+            raise serializers.ValidationError('car or distance is required')
+        return data
+
+
+class RefuelSerializer(serializers.Serializer):
+    from_city = CityField()
+    to_city = CityField()
+    car = serializers.CharField(required=False)
+    range = serializers.IntegerField(
+        required=False,
+        min_value=10,
+        max_value=3000,
+    )
+    tank = serializers.IntegerField(default=50, min_value=5, max_value=200)
+
+    def validate(self, data):
+        if not data.get('car') and not data.get('range'):
+            raise serializers.ValidationError('car or range is required')
+        return data
+
+
+class TripCostSerializer(serializers.Serializer):
+    from_city = CityField()
+    to_city = CityField()
+    car = serializers.CharField(required=False)
@@ -1,3 +1,11 @@
+import json
+import time
+import itertools
+import threading
+import numpy as np
+import networkx as nx
+
+from types import SimpleNamespace
 from datetime import datetime, timedelta, timezone
 
 from django.urls import reverse
@@ -5,16 +13,20 @@ from django.contrib.auth import get_user_model
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
 from django.contrib.auth.tokens import default_token_generator
+from django.test import SimpleTestCase
 
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from users import serializers
+from drive_hub.cache import LRUCache
+from users import cities, geo, routes, serializers, tours, utils
 from users.models import Achievement, UserAchievement, Comment
 from users.utils import create_register_token
 from enterprises.serializers import CompanySerializer, CarServiceSerializer
 from enterprises.models import Company, CarService
 from fuels.models import Fuel
+from fuels.stations import get_store
+from cars.models import ElectricCar, FuelCar
 
 
 User = get_user_model()
@@ -331,8 +343,577 @@ class RouteTest(APITestCase):
             username='hsdfb', password='34324'
         )
         self.client.force_authenticate(self.user)
+        fuel = Fuel.objects.create(name='gas', price=51.00)
+        FuelCar.objects.create(
+            owner=self.user,
+            name='Golf',
+            year=2015,
+            registration_number='AA1234BB',
+            image='cars/golf.jpg',
+            fuel_efficiency=10,
+            fuel_type=fuel,
+        )
 
     def test_route(self):
         data = {'from_': 'Lviv', 'where': 'Kyiv'}
         response = self.client.post(reverse('routes'), data=data, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_batch_route(self):
+        data = {
+            'routes': [
+                {'from_city': 'Lviv', 'to_city': 'Kyiv'},
+                {'from_city': 'Kyiv', 'to_city': 'Odesa'},
+                {'from_city': 'Lviv', 'to_city': 'Odesa'},
+            ],
+        }
+        response = self.client.post(
+            reverse('routes_batch'), data=data, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        routes = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(routes), 3)
+        for route, pair in zip(routes, data['routes']):
+            self.assertEqual(route['from_city'], pair['from_city'])
+            self.assertEqual(route['city'], pair['to_city'])
+            self.assertEqual(route['shortest_way'][0], pair['from_city'])
+            self.assertEqual(route['shortest_way'][-1], pair['to_city'])
+
+    def test_distance_matrix(self):
+        data = {'origins': ['Lviv', 'Kyiv'], 'destinations': ['Kyiv']}
+        response = self.client.post(
+            reverse('routes_matrix'), data=data, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['distances'][1], [0.0])
+        self.assertEqual(response.data['hours'][1], [0.0])
+
+        data = {'origins': ['Lviv'] * 201, 'destinations': ['Kyiv']}
+        response = self.client.post(
+            reverse('routes_matrix'), data=data, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_multi_stop(self):
+        data = {
+            'stops': ['Odesa', 'Lviv', 'Kharkiv', 'Kyiv'],
+            'start': 'Kyiv',
+            'round_trip': True,
+        }
+        response = self.client.post(
+            reverse('routes_multi_stop'), data=data, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['order'][0], 'Kyiv')
+        self.assertEqual(response.data['order'][-1], 'Kyiv')
+        self.assertEqual(len(response.data['legs']), 4)
+
+    def test_route_city_spelling(self):
+        data = {'from_city': 'Київ', 'to_city': 'lvov'}
+        response = self.client.post(reverse('routes'), data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['city'], 'Lviv')
+
+    def test_route_geometry(self):
+        data = {'from_city': 'Lviv', 'to_city': 'Kyiv', 'geometry': 'geojson'}
+        response = self.client.post(reverse('routes'), data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        geometry = response.data['geometry']['geometry']
+        self.assertEqual(geometry['type'], 'LineString')
+        self.assertEqual(
+            len(geometry['coordinates']), len(response.data['shortest_way'])
+        )
+
+    def test_city_autocomplete(self):
+        response = self.client.get(
+            reverse('cities_autocomplete'), {'q': 'Чер', 'limit': 3}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(response.data[0]['city'], 'Chernihiv')
+
+    def test_trip_cost(self):
+        data = {'from_city': 'Lviv', 'to_city': 'Kyiv'}
+        response = self.client.post(
+            reverse('routes_trip_cost'), data=data, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['cars']), 1)
+        self.assertEqual(response.data['cars'][0]['fuel_type'], 'gas')
+
+    def test_route_alternatives(self):
+        data = {'from_city': 'Lviv', 'to_city': 'Kharkiv', 'alternatives': 3}
+        response = self.client.post(reverse('routes'), data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        alternatives = response.data['alternatives']
+        self.assertLessEqual(len(alternatives), 2)
+        for route in alternatives:
+            self.assertNotEqual(
+                route['shortest_way'], response.data['shortest_way'],
+            )
+            self.assertGreaterEqual(
+                route['distance'], response.data['distance'],
+            )
+
+    def test_reachable(self):
+        data = {'city': 'Lviv', 'distance': 157}
+        response = self.client.post(
+            reverse('routes_reachable'), data=data, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['distance'], 150)
+
+    def test_reachable_fuel_car(self):
+        data = {'city': 'Lviv', 'car': 'AA1234BB'}
+        response = self.client.post(
+            reverse('routes_reachable'), data=data, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_route_cache_admin_only(self):
+        response = self.client.get(reverse('routes_cache'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('routes_cache'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('hits', response.data)
+
+    def test_refuel_fuel_car(self):
+        data = {
+            'from_city': 'Uzhhorod',
+            'to_city': 'Kharkiv',
+            'car': 'AA1234BB',
+            'tank': 30,
+        }
+        response = self.client.post(
+            reverse('routes_refuel'), data=data, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['range'], 300)
+        self.assertEqual(response.data['status'], 'success')
+        self.assertGreater(len(response.data['stops']), 0)
+
+    def test_refuel_electric_car(self):
+        ElectricCar.objects.create(
+            owner=self.user,
+            name='Leaf',
+            year=2019,
+            registration_number='AA4321BB',
+            image='cars/leaf.jpg',
+            battery=40,
+            power_reserve=250,
+        )
+        data = {
+            'from_city': 'Lviv',
+            'to_city': 'Kharkiv',
+            'car': 'AA4321BB',
+        }
+        response = self.client.post(
+            reverse('routes_refuel'), data=data, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['range'], 250)
+        for stop in response.data['stops']:
+            self.assertEqual(stop['brand'], 'okko')
+
+
+class BatchRoutesTest(SimpleTestCase):
+    def test_input_order(self):
+        pairs = [
+            ('Lviv', 'Kyiv'), ('Kyiv', 'Odesa'), ('Lviv', 'Odesa'),
+            ('Kyiv', 'Lviv'), ('Odesa', 'Odesa'),
+        ]
+        results = list(utils.create_batch_routes(pairs))
+        self.assertEqual([result[:2] for result in results], pairs)
+        for from_city, to_city, way, km in results:
+            self.assertEqual((way[0], way[-1]), (from_city, to_city))
+            self.assertIsInstance(km, float)
+            self.assertAlmostEqual(
+                km, round(routes.shortest_path(from_city, to_city)[1], 2),
+            )
+
+
+class RouteAlgorithmTest(SimpleTestCase):
+    pairs = [
+        ('Lviv', 'Kharkiv'),
+        ('Kyiv', 'Odesa'),
+        ('Uzhhorod', 'Luhansk'),
+        ('Chernihiv', 'Berdiansk'),
+    ]
+
+    def test_astar_distance(self):
+        for from_city, to_city in self.pairs:
+            for backend in ['networkx', 'csr']:
+                _, dijkstra = routes.shortest_path(
+                    from_city, to_city, backend, 'dijkstra'
+                )
+                _, astar = routes.shortest_path(
+                    from_city, to_city, backend, 'astar'
+                )
+                self.assertAlmostEqual(dijkstra, astar, places=6)
+
+    def test_astar_visits_fewer_cities(self):
+        csr = routes.get_csr()
+        for from_city, to_city in self.pairs:
+            source, target = csr.index[from_city], csr.index[to_city]
+            heuristic = routes.get_heuristic(to_city).tolist()
+            *_, dijkstra = csr.search(source, target)
+            *_, astar = csr.search(source, target, heuristic)
+            self.assertLess(astar, dijkstra)
+
+    def test_tour_is_close_to_optimal(self):
+        stops = ['Lviv', 'Kyiv', 'Odesa', 'Kharkiv', 'Uzhhorod', 'Poltava']
+        distances = routes.distance_rows(stops, stops).tolist()
+        for round_trip in [True, False]:
+            tour = tours.solve_tour(distances, round_trip=round_trip)
+            self.assertEqual(sorted(tour), list(range(len(stops))))
+            self.assertEqual(tour[0], 0)
+            best = min(
+                tours.get_length([0, *order], distances, round_trip)
+                for order in itertools.permutations(range(1, len(stops)))
+            )
+            # local search, a few percent over the best order is fine
+            self.assertLessEqual(
+                tours.get_length(tour, distances, round_trip), best * 1.1,
+            )
+
+
+class RouteGraphTest(SimpleTestCase):
+    def get_dense_graph(self, cities):
+        lat, lon = routes.get_coordinates(cities)
+        distances = geo.distance_matrix(lat, lon)
+        names = [city['city'] for city in cities]
+        i, j = routes.get_candidates(lon)
+        graph = nx.Graph()
+        graph.add_nodes_from(names)
+        graph.add_weighted_edges_from(
+            (names[a], names[b], round(float(distances[a, b]) + 10, 2))
+            for a, b in zip(i.tolist(), j.tolist())
+        )
+        return graph
+
+    def test_graph_is_connected(self):
+        graph = routes.get_graph()
+        dense = self.get_dense_graph(routes.get_cities())
+        self.assertTrue(nx.is_connected(graph))
+        self.assertLess(graph.number_of_edges(), dense.number_of_edges())
+
+    def test_stretch(self):
+        graph = routes.generate_routes(routes.get_cities())
+        dense = self.get_dense_graph(routes.get_cities())
+        lengths = dict(nx.all_pairs_dijkstra_path_length(graph))
+        for source, targets in nx.all_pairs_dijkstra_path_length(dense):
+            for target, distance in targets.items():
+                found = lengths[source][target]
+                self.assertGreaterEqual(found, distance - 1e-6)
+                self.assertLessEqual(found, routes.STRETCH * distance + 1e-6)
+
+    def test_far_groups_are_connected(self):
+        rng = np.random.default_rng(2)
+        cities = [
+            {'city': f'{group}-{i}', 'lat': lat, 'lng': lng}
+            for group, (center_lat, center_lng) in enumerate(
+                [(45, 20), (50, 30), (48, 40)],
+            )
+            for i, (lat, lng) in enumerate(zip(
+                rng.normal(center_lat, 0.3, 30),
+                rng.normal(center_lng, 0.3, 30),
+            ))
+        ]
+        graph = routes.generate_routes(cities)
+        dense = self.get_dense_graph(cities)
+        self.assertTrue(nx.is_connected(graph))
+        self.assertLessEqual(
+            graph.number_of_edges(),
+            dense.number_of_edges() + 2,
+        )
+
+
+class RouteTableTest(SimpleTestCase):
+    def test_same_as_dijkstra(self):
+        graph = routes.get_graph()
+        names = routes.get_names()
+        distances, _ = routes.get_table()
+        index = routes.get_index()
+        for source in names[::25]:
+            lengths, paths = nx.single_source_dijkstra(graph, source)
+            for target in names[::7]:
+                distance = distances[index[source], index[target]]
+                if target not in lengths:
+                    self.assertEqual(distance, np.inf)
+                    continue
+                self.assertAlmostEqual(distance, lengths[target])
+
+                # ties may pick another way of the same length
+                way, km = routes.table_path(source, target)
+                self.assertEqual((way[0], way[-1]), (source, target))
+                self.assertAlmostEqual(
+                    sum(
+                        graph[first][second]['weight']
+                        for first, second in zip(way, way[1:])
+                    ),
+                    lengths[target],
+                )
+                self.assertAlmostEqual(km, lengths[target])
+
+
+class GeometryTest(SimpleTestCase):
+    def test_encode_polyline(self):
+        polyline = geo.encode_polyline(
+            [38.5, 40.7, 43.252], [-120.2, -120.95, -126.453]
+        )
+        self.assertEqual(polyline, '_p~iF~ps|U_ulLnnqC_mqNvxq`@')
+
+    def test_legs(self):
+        way, km = utils.create_routes('Uzhhorod', 'Luhansk')
+        geometry = utils.get_route_geometry(way, 'polyline', 80)
+        self.assertEqual(len(geometry['legs']), len(way) - 1)
+        self.assertAlmostEqual(
+            sum(leg['distance'] for leg in geometry['legs']), km, places=1
+        )
+
+
+class CityIndexTest(SimpleTestCase):
+    def setUp(self):
+        self.index = cities.get_city_index()
+
+    def test_resolve(self):
+        names = {
+            'Kyiv': ['kyiv', 'KYIV', 'Київ', 'Kiev', 'Киев', 'Kyvi'],
+            'Ivano-Frankivsk': ['ivano frankivsk', 'Івано-Франківськ'],
+            'Zaporizhzhia': ['Запоріжжя', 'zaporizhia'],
+            'Bila Tserkva': ['Біла Церква'],
+        }
+        for city, spellings in names.items():
+            for spelling in spellings:
+                self.assertEqual(self.index.resolve(spelling), city)
+        self.assertIsNone(self.index.resolve('Qwerty'))
+
+    def test_autocomplete(self):
+        self.assertEqual(
+            self.index.autocomplete('kh', 2), ['Kharkiv', 'Kherson']
+        )
+        self.assertEqual(self.index.autocomplete('tserk'), ['Bila Tserkva'])
+        self.assertEqual(self.index.autocomplete('Odessa'), ['Odesa'])
+
+    def test_autocomplete_fallback_is_cached(self):
+        self.index.autocomplete('Zhitomir')
+        hits = self.index.cached_resolve.cache_info().hits
+        self.assertEqual(self.index.autocomplete('Zhitomir'), ['Zhytomyr'])
+        self.assertEqual(self.index.cached_resolve.cache_info().hits, hits + 1)
+
+
+class RefuelTest(SimpleTestCase):
+    def test_near_segment(self):
+        rng = np.random.default_rng(1)
+        lat = rng.uniform(48, 51, 3000)
+        lon = rng.uniform(24, 32, 3000)
+        grid = geo.GridIndex(lat, lon, cell=0.25)
+        for lat1, lon1, lat2, lon2, width in [
+            (49.84, 24.03, 50.45, 30.52, 5),
+            (49.0, 28.0, 49.0, 28.0, 10),
+            (50.9, 31.5, 48.2, 25.1, 2),
+        ]:
+            points, distances, along = grid.near_segment(
+                lat1, lon1, lat2, lon2, width,
+            )
+
+            # distance to the segment in the same local planar frame
+            scale = geo.KM_PER_DEGREE * np.cos(np.radians((lat1 + lat2) / 2))
+            end = np.array([
+                (lon2 - lon1) * scale, (lat2 - lat1) * geo.KM_PER_DEGREE,
+            ])
+            expected = {}
+            for i in range(len(lat)):
+                point = np.array([
+                    (lon[i] - lon1) * scale,
+                    (lat[i] - lat1) * geo.KM_PER_DEGREE,
+                ])
+                length = end @ end
+                part = min(max(point @ end / length, 0), 1) if length else 0
+                distance = np.hypot(*(point - part * end))
+                if distance <= width:
+                    expected[i] = distance
+
+            self.assertEqual(sorted(points.tolist()), sorted(expected))
+            for point, distance in zip(points.tolist(), distances.tolist()):
+                self.assertAlmostEqual(distance, expected[point])
+            self.assertTrue(((0 <= along) & (along <= 1)).all())
+
+    def check_stops(self, stops, max_range):
+        usable = max_range * (1 - utils.FUEL_RESERVE)
+        position, reach = 0, usable
+        for station, at, detour in stops:
+            self.assertGreater(at, position)
+            self.assertLessEqual(at + detour, reach + 1e-9)
+            position, reach = at, at + usable - detour
+        return reach
+
+    def test_plan_refuelling(self):
+        way, km = utils.create_routes('Uzhhorod', 'Kharkiv')
+        stops, reached = utils.plan_refuelling(way, 300)
+        self.assertTrue(reached)
+        self.assertGreater(len(stops), 0)
+        self.assertGreaterEqual(self.check_stops(stops, 300), km - 1)
+
+    def test_electric_stops_have_chargers(self):
+        store = get_store()
+        chargers = {
+            store.urls[position]
+            for position in np.flatnonzero(store.charger).tolist()
+        }
+        way, _ = utils.create_routes('Lviv', 'Kharkiv')
+        stops, _ = utils.plan_refuelling(way, 250, electric=True)
+        self.check_stops(stops, 250)
+        for station, at, detour in stops:
+            self.assertEqual(station['brand'], 'okko')
+            self.assertIn(station['url'], chargers)
+
+    def test_not_enough_range(self):
+        way, _ = utils.create_routes('Uzhhorod', 'Kharkiv')
+        stops, reached = utils.plan_refuelling(way, 15)
+        self.assertFalse(reached)
+        self.check_stops(stops, 15)
+
+    def test_car_range(self):
+        fuel_car = SimpleNamespace(fuel_efficiency=8)
+        self.assertEqual(utils.get_car_range(fuel_car, tank=40), 500)
+        self.assertEqual(utils.get_car_range(fuel_car), 625)
+        electric_car = SimpleNamespace(power_reserve=320, fuel_efficiency=0)
+        self.assertEqual(utils.get_car_range(electric_car), 320)
+
+
+class LRUCacheTest(SimpleTestCase):
+    def test_eviction_and_counters(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+
+        # b was used least recently
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+        stats = cache.get_stats()
+        self.assertEqual(stats['size'], 2)
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['evictions'], 1)
+
+    def test_broken_shared_cache(self):
+        cache = LRUCache(maxsize=2, shared='missing')
+        with self.assertLogs('drive_hub.cache', 'ERROR'):
+            self.assertIsNone(cache.get('a'))
+            self.assertEqual(cache.get_or_set('a', lambda: 1), 1)
+        self.assertEqual(cache.get('a'), 1)
+        stats = cache.get_stats()
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['hits'], 1)
+
+    def test_routes_share_entry(self):
+        utils.route_cache.clear()
+        misses = utils.route_cache.get_stats()['misses']
+
+        way, km = utils.create_routes('Kyiv', 'Lviv')
+        back, back_km = utils.create_routes('Lviv', 'Kyiv')
+        self.assertEqual(len(utils.route_cache), 1)
+        self.assertEqual(utils.route_cache.get_stats()['misses'], misses + 1)
+        self.assertEqual(back, way[::-1])
+        self.assertEqual(back_km, km)
+
+
+class AlternativePathsTest(SimpleTestCase):
+    def get_roads(self, way):
+        graph = routes.get_graph()
+        return {
+            frozenset(road): graph[road[0]][road[1]]['weight']
+            for road in zip(way, way[1:])
+        }
+
+    def test_alternatives(self):
+        for from_city, to_city, k, max_overlap in [
+            ('Lviv', 'Kharkiv', 3, 0.7),
+            ('Uzhhorod', 'Odesa', 4, 0.5),
+            ('Kyiv', 'Chernihiv', 2, 0.9),
+        ]:
+            found = routes.alternative_paths(
+                from_city, to_city, k, max_overlap,
+            )
+            self.assertGreater(len(found), 0)
+            self.assertLessEqual(len(found), k)
+
+            shortest, km = routes.shortest_path(from_city, to_city)
+            self.assertEqual(found[0][0], shortest)
+            self.assertAlmostEqual(found[0][1], km)
+
+            distances = [distance for _, distance in found]
+            self.assertEqual(distances, sorted(distances))
+            for way, distance in found:
+                self.assertEqual((way[0], way[-1]), (from_city, to_city))
+                self.assertEqual(len(way), len(set(way)))
+                self.assertAlmostEqual(
+                    sum(self.get_roads(way).values()), distance,
+                )
+
+            # the later found of two ways shares at most max_overlap of it
+            for (first, a), (second, b) in itertools.combinations(found, 2):
+                first, second = self.get_roads(first), self.get_roads(second)
+                shared = sum(first[road] for road in first.keys() & second)
+                self.assertLessEqual(shared, max_overlap * max(a, b) + 1e-6)
+
+    def test_k_and_same_city(self):
+        self.assertEqual(len(routes.alternative_paths('Lviv', 'Kyiv', 1)), 1)
+        self.assertEqual(routes.alternative_paths('Lviv', 'Lviv'), [])
+
+
+class ReachableTest(SimpleTestCase):
+    def test_same_as_networkx(self):
+        graph = routes.get_graph()
+        for city, max_distance in [('Lviv', 150), ('Kyiv', 400.5)]:
+            expected = nx.single_source_dijkstra_path_length(
+                graph, city, cutoff=max_distance,
+            )
+            for backend in ['networkx', 'csr']:
+                found = routes.reachable_cities(city, max_distance, backend)
+                self.assertEqual(found.keys(), expected.keys())
+                for name, distance in found.items():
+                    self.assertAlmostEqual(distance, expected[name])
+
+    def test_reachable_cities(self):
+        max_distance, found = utils.get_reachable_cities('Lviv', 209.9)
+        self.assertEqual(max_distance, 200)
+        expected = routes.reachable_cities('Lviv', 200)
+        self.assertEqual(len(found), len(expected) - 1)
+        self.assertNotIn('Lviv', [city for city, _ in found])
+        distances = [distance for _, distance in found]
+        self.assertEqual(distances, sorted(distances))
+        self.assertTrue(all(distance <= 200 for distance in distances))
+
+
+class SingleFlightTest(SimpleTestCase):
+    def test_concurrent_requests_compute_once(self):
+        cache = LRUCache(maxsize=10)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'way'
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(cache.get_or_set('a', compute))
+            )
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['way'] * 10)
+        self.assertEqual(cache.get_stats()['coalesced'], 9)
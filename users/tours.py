@@ -0,0 +1,112 @@
+import time
+
+
+def get_length(tour, distances, round_trip=True):
+    """Length of the tour, back to the first stop with round_trip."""
+    legs = zip(tour, tour[1:] + tour[:1] if round_trip else tour[1:])
+    return sum(distances[a][b] for a, b in legs)
+
+
+def nearest_neighbour(distances, start=0):
+    """Greedy tour: always go to the closest stop not visited yet."""
+    tour = [start]
+    left = set(range(len(distances))) - {start}
+    while left:
+        last = distances[tour[-1]]
+        closest = min(left, key=lambda stop: last[stop])
+        tour.append(closest)
+        left.remove(closest)
+    return tour
+
+
+def two_opt(tour, distances, last, deadline):
+    """
+    Reverse parts of tour[1:last + 1] while the tour gets shorter.
+    Returns whether anything changed.
+    """
+    size = len(tour)
+    changed = False
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(1, last):
+            a = tour[i - 1]
+            for j in range(i + 1, last + 1):
+                b, c, d = tour[i], tour[j], tour[(j + 1) % size]
+                delta = (
+                    distances[a][c] + distances[b][d] -
+                    distances[a][b] - distances[c][d]
+                )
+                if delta < -1e-9:
+                    tour[i:j + 1] = tour[i:j + 1][::-1]
+                    improved = changed = True
+    return changed
+
+
+def or_opt(tour, distances, last, deadline):
+    """
+    Move chains of 1-3 stops of tour[1:last + 1] to the place where they
+    cost the least, possibly reversed. Returns whether anything changed.
+    """
+    size = len(tour)
+    # stops after last are pinned, nothing may be put behind them
+    places = size - 1 if last == size - 1 else last
+    changed = False
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for length in [1, 2, 3]:
+            for i in range(1, last - length + 2):
+                chain = tour[i:i + length]
+                first, end = chain[0], chain[-1]
+                prev, next = tour[i - 1], tour[(i + length) % size]
+                saved = (
+                    distances[prev][first] + distances[end][next] -
+                    distances[prev][next]
+                )
+                rest = tour[:i] + tour[i + length:]
+                best, place, reverse = saved - 1e-9, None, False
+                for p in range(places - length + 1):
+                    a, b = rest[p], rest[(p + 1) % len(rest)]
+                    cost = distances[a][first] + distances[end][b]
+                    cost -= distances[a][b]
+                    if cost < best:
+                        best, place, reverse = cost, p, False
+                    cost = distances[a][end] + distances[first][b]
+                    cost -= distances[a][b]
+                    if cost < best:
+                        best, place, reverse = cost, p, True
+                if place is not None:
+                    chain = chain[::-1] if reverse else chain
+                    tour[:] = rest[:place + 1] + chain + rest[place + 1:]
+                    improved = changed = True
+    return changed
+
+
+def solve_tour(distances, start=0, round_trip=False, time_budget=0.2):
+    """
+    Short order to visit every stop from start, distances is a square
+    matrix. Nearest neighbour tour improved with 2-opt and Or-opt moves
+    until none helps or time_budget seconds are spent. Without
+    round_trip the tour ends at whichever stop suits best: a dummy stop
+    at zero distance from all others is pinned at the end of the tour.
+    """
+    distances = [list(row) for row in distances]
+    if not round_trip:
+        for row in distances:
+            row.append(0.0)
+        distances.append([0.0] * len(distances[0]))
+        tour = nearest_neighbour([row[:-1] for row in distances[:-1]], start)
+        tour.append(len(distances) - 1)
+        last = len(tour) - 2
+    else:
+        tour = nearest_neighbour(distances, start)
+        last = len(tour) - 1
+
+    deadline = time.perf_counter() + time_budget
+    while time.perf_counter() < deadline:
+        changed = two_opt(tour, distances, last, deadline)
+        changed |= or_opt(tour, distances, last, deadline)
+        if not changed:
+            break
+    return tour if round_trip else tour[:-1]
@@ -1,55 +1,53 @@
-import json
 import jwt
-import networkx as nx
+import json
+import numpy as np
+
+from decimal import Decimal
 
+from math import ceil
 from datetime import datetime, timedelta
+from collections import defaultdict
 
 from django.conf import settings
 from django.core.mail import send_mail
 
-from geopy.distance import geodesic
+from drive_hub.cache import LRUCache
 
+from fuels.stations import get_station_index, get_store
 
-with open('staticfiles/json/cities.json', 'r') as f:
-    cities = json.load(f)
+from users.geo import encode_polyline
 
+from users.routes import (
+    alternative_paths,
+    distance_rows,
+    get_city_coordinates,
+    get_graph,
+    get_index,
+    get_version,
+    leg_distances,
+    reachable_cities,
+    shortest_path,
+    single_source_routes,
+)
+from users.tours import get_length, solve_tour
 
-def get_cities():
-    return [i['city'] for i in cities]
 
+# Part of the car range kept in reserve when planning refuelling stops
+FUEL_RESERVE = 0.1
+# Stations farther from the road are not considered as stops, km
+STATION_DETOUR = 5
 
-def generate_routes(cities):
-    """Generate routes between cities with similar coordinates."""
-    routes = nx.Graph()
-    for city in cities:
-        routes.add_node(city['city'])
 
-        # get city coordinates
-        from_city_lon = float(city['lng'])
-        from_city_coords = (float(city['lat']), from_city_lon)
-
-        for other in cities:
-            to_city_lon = float(other['lng'])
-            to_city_coords = (float(other['lat']), to_city_lon)
-            if int(from_city_lon) > int(to_city_lon):
-                similar = int(from_city_lon) - int(to_city_lon)
-                if similar < 2:
-                    distance = geodesic(from_city_coords, to_city_coords).km + 10
-                    routes.add_edge(
-                        city['city'],
-                        other['city'],
-                        weight=round(distance, 2),
-                    )
-            else:
-                similar = int(to_city_lon) - int(from_city_lon)
-                if similar < 2:
-                    distance = geodesic(from_city_coords, to_city_coords).km + 10
-                    routes.add_edge(
-                        city['city'],
-                        other['city'],
-                        weight=round(distance, 2),
-                    )
-    return routes
+route_cache = LRUCache(
+    maxsize=settings.ROUTES_CACHE_SIZE,
+    shared=settings.ROUTES_SHARED_CACHE,
+    prefix='routes',
+)
+reach_cache = LRUCache(
+    maxsize=settings.ROUTES_CACHE_SIZE,
+    shared=settings.ROUTES_SHARED_CACHE,
+    prefix='reach',
+)
 
 
 def create_register_token(time=5, **kwargs):
@@ -73,22 +71,285 @@ def get_register_token(token):
     return token
 
 
-def create_routes(from_city, to_city):
-    """Create the shortest way between two cities."""
-    routes = generate_routes(cities)
-    way_to_city = nx.shortest_path(
-        G=routes,
-        source=from_city,
-        target=to_city,
-        weight='weight',
+def create_routes(from_city, to_city, algorithm=None):
+    """
+    Create the shortest way between two cities.
+    Roads go both ways, so a-b and b-a share one cached result.
+    """
+    first, second = sorted([from_city, to_city])
+    key = f'{get_version()}:{first}:{second}'
+
+    def compute():
+        way_to_city, distance_in_km = shortest_path(
+            first,
+            second,
+            algorithm=algorithm,
+        )
+        return way_to_city, round(distance_in_km, 2)
+
+    way_to_city, distance_in_km = route_cache.get_or_set(key, compute)
+    if first != from_city:
+        way_to_city = way_to_city[::-1]
+    return list(way_to_city), distance_in_km
+
+
+def create_alternative_routes(from_city, to_city, k, max_overlap):
+    """Alternatives to the shortest way, up to k ways including it."""
+    key = (
+        f'{get_version()}:alternatives:{from_city}:{to_city}:'
+        f'{k}:{max_overlap}'
     )
-    distance_in_km = nx.shortest_path_length(
-        G=routes,
-        source=from_city,
-        target=to_city,
-        weight='weight',
+    return route_cache.get_or_set(
+        key,
+        lambda: [
+            (way, round(distance, 2))
+            for way, distance in alternative_paths(
+                from_city,
+                to_city,
+                k,
+                max_overlap,
+            )
+        ],
+    )
+
+
+def create_batch_routes(pairs):
+    """
+    Shortest ways for many pairs of cities, in the order of pairs.
+    Pairs are grouped by origin, so each origin runs Dijkstra only once,
+    and a result is yielded once all pairs before it are done.
+    """
+    pairs = list(pairs)
+    by_source = defaultdict(list)
+    for i, (from_city, _) in enumerate(pairs):
+        by_source[from_city].append(i)
+
+    done = {}
+    position = 0
+    for from_city, indices in by_source.items():
+        distances, ways = single_source_routes(from_city)
+        for i in indices:
+            to_city = pairs[i][1]
+            if to_city in distances:
+                distance = round(float(distances[to_city]), 2)
+                done[i] = from_city, to_city, ways[to_city], distance
+            else:
+                done[i] = from_city, to_city, None, None
+        while position in done:
+            yield done.pop(position)
+            position += 1
+
+
+def get_reachable_cities(from_city, max_distance):
+    """
+    Cities reachable from from_city, nearest first. The budget is rounded
+    down to 10 km, so close budgets share one cached result.
+    """
+    max_distance = int(max_distance // 10 * 10)
+    key = f'{get_version()}:{from_city}:{max_distance}'
+
+    def compute():
+        found = reachable_cities(from_city, max_distance)
+        return sorted(
+            (
+                (city, round(distance, 2))
+                for city, distance in found.items()
+                if city != from_city
+            ),
+            key=lambda item: item[1],
+        )
+
+    return max_distance, reach_cache.get_or_set(key, compute)
+
+
+def create_distance_matrix(origins, destinations, avg_speed):
+    """
+    Distances (km) and drive times (hours) as nested lists,
+    None where a destination can't be reached.
+    """
+    distances = distance_rows(origins, destinations)
+    reachable = np.isfinite(distances)
+    times = np.round(distances / avg_speed, 2)
+    distances = np.round(distances, 2)
+    return (
+        np.where(reachable, distances, None).tolist(),
+        np.where(reachable, times, None).tolist(),
     )
-    return way_to_city, round(distance_in_km, 2)
+
+
+def create_tour(stops, start=None, round_trip=False):
+    """
+    Order to visit all stops from start (the first stop by default)
+    and the total distance, None when some stop can't be reached.
+    """
+    stops = list(dict.fromkeys(stops))
+    if start is not None and start in stops:
+        stops.remove(start)
+    if start is not None:
+        stops.insert(0, start)
+
+    def compute():
+        distances = distance_rows(stops, stops)
+        if not np.isfinite(distances).all():
+            return None, None
+        distances = distances.tolist()
+        tour = solve_tour(
+            distances,
+            round_trip=round_trip,
+            time_budget=settings.ROUTES_TOUR_TIME,
+        )
+        order = [stops[i] for i in tour]
+        if round_trip:
+            order.append(order[0])
+        return order, round(get_length(tour, distances, round_trip), 2)
+
+    key = f'{get_version()}:tour:{round_trip}:{":".join(stops)}'
+    order, km = route_cache.get_or_set(key, compute)
+    return order and list(order), km
+
+
+def get_car_range(car, tank=50):
+    """Range of a car in km, fuel cars are assumed to have a full tank."""
+    if hasattr(car, 'power_reserve'):
+        return car.power_reserve
+    return tank / max(car.fuel_efficiency, 1) * 100
+
+
+def get_trip_cost(car, km):
+    """
+    Fuel (litres) and its cost for a fuel car, energy (kWh) and number of
+    charges for an electric car. Fuel prices already include an active
+    coupon, the coupon tasks discount Fuel.price while it lasts.
+    """
+    if hasattr(car, 'power_reserve'):
+        charges = km / max(car.power_reserve, 1)
+        return {
+            'charges': round(charges, 2),
+            'energy': round(charges * car.battery, 2),
+            'cost': None,
+        }
+
+    fuel = car.fuel_type
+    amount = round(km * car.fuel_efficiency / 100, 2)
+    coupon = fuel.coupon
+    return {
+        'fuel_type': fuel.name,
+        'fuel': amount,
+        'price': fuel.price,
+        'coupon': coupon.name if coupon else None,
+        'discount': coupon.discount if coupon else 0,
+        'cost': round(Decimal(str(amount)) * fuel.price, 2),
+    }
+
+
+def plan_refuelling(way, max_range, electric=False):
+    """
+    Pick refuelling stops along a way between cities. Stations are
+    looked up near every leg of the way, and each stop is the farthest
+    station reachable with the fuel left, keeping a reserve.
+    Returns stops as (station, km from start, detour km) and
+    whether the destination can be reached.
+    """
+    grid = get_station_index()
+    store = get_store()
+    graph = get_graph()
+    index = get_index()
+    lat, lon = get_city_coordinates()
+
+    candidates = {}
+    travelled = 0
+    for first, second in zip(way, way[1:]):
+        a, b = index[first], index[second]
+        length = graph[first][second]['weight']
+        points, detours, along = grid.near_segment(
+            lat[a], lon[a], lat[b], lon[b], STATION_DETOUR,
+        )
+        for point, detour, part in zip(
+            points.tolist(), detours.tolist(), along.tolist(),
+        ):
+            if electric and not store.charger[point]:
+                continue
+            if point not in candidates:
+                candidates[point] = (travelled + part * length, detour)
+        travelled += length
+
+    ordered = sorted(candidates.items(), key=lambda item: item[1])
+    usable = max_range * (1 - FUEL_RESERVE)
+    position, reach = 0, usable
+    stops = []
+    while reach < travelled:
+        options = [
+            (point, at, detour) for point, (at, detour) in ordered
+            if position < at and at + detour <= reach
+        ]
+        if not options:
+            return stops, False
+        point, at, detour = max(options, key=lambda option: option[1])
+        stops.append((store[point], at, detour))
+        position, reach = at, at + usable - detour
+    return stops, True
+
+
+def get_time_drive(km, avg_speed):
+    time_drive = round(km / avg_speed, 2)
+    hours_drive = int(time_drive)
+    minutes_drive = ceil(time_drive % 1 * 60)
+    return f'{hours_drive} hours {minutes_drive} minutes'
+
+
+def stream_json_list(items):
+    """Encode items as a json array piece by piece."""
+    yield '['
+    for i, item in enumerate(items):
+        yield (',' if i else '') + json.dumps(item)
+    yield ']'
+
+
+def get_route_legs(way, avg_speed):
+    """Distance and drive time of every leg along a way."""
+    return [
+        {
+            'from_city': from_city,
+            'city': to_city,
+            'distance': round(distance, 2),
+            f'time_drive ({avg_speed} km/h)': get_time_drive(
+                distance, avg_speed,
+            ),
+        }
+        for from_city, to_city, distance in zip(
+            way, way[1:], leg_distances(way),
+        )
+    ]
+
+
+def get_route_geometry(way, geometry, avg_speed):
+    """
+    Way drawn through the city coordinates, as an encoded polyline or a
+    GeoJSON LineString feature, with distance and time of every leg.
+    """
+    lat, lon = get_city_coordinates()
+    index = get_index()
+    ids = [index[city] for city in way]
+    legs = get_route_legs(way, avg_speed)
+    if geometry == 'polyline':
+        return {'polyline': encode_polyline(lat[ids], lon[ids]), 'legs': legs}
+    return {
+        'type': 'Feature',
+        'geometry': {
+            'type': 'LineString',
+            'coordinates': np.column_stack([lon[ids], lat[ids]]).tolist(),
+        },
+        'properties': {'legs': legs},
+    }
+
+
+def stream_feature_collection(features, **properties):
+    """Encode GeoJSON features as a FeatureCollection piece by piece."""
+    yield '{"type": "FeatureCollection", "properties": '
+    yield json.dumps(properties)
+    yield ', "features": '
+    yield from stream_json_list(features)
+    yield '}'
 
 
 def send_token_email(url, email):
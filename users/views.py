@@ -1,5 +1,5 @@
-from math import ceil
-
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
@@ -11,15 +11,17 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.generics import CreateAPIView, DestroyAPIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 
 from jwt.exceptions import ExpiredSignatureError
 
 from users import serializers, utils
+from users.cities import get_city_index, resolve_city
 from users.models import Achievement, Comment
 from users.permissions import IsNotAuthenticated, IsUser
 from users.tasks import get_activity_scheduler
 
+from cars.models import ElectricCar, FuelCar
 from enterprises.serializers import CompanySerializer, CarServiceSerializer
 
 
@@ -227,7 +229,14 @@ class RouteAPIView(CreateAPIView):
         serializer.is_valid(raise_exception=True)
 
         from_city = request.query_params.get('from-city')
-        if not from_city:
+        if from_city:
+            from_city = resolve_city(from_city)
+            if not from_city:
+                return Response(
+                    data={'status': 'from-city is not a known city'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        else:
             from_city = serializer.validated_data.get('from_city')
             if not from_city:
                 return Response(
@@ -236,7 +245,14 @@ class RouteAPIView(CreateAPIView):
                 )
 
         to_city = request.query_params.get('to-city')
-        if not to_city:
+        if to_city:
+            to_city = resolve_city(to_city)
+            if not to_city:
+                return Response(
+                    data={'status': 'to-city is not a known city'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        else:
             to_city = serializer.validated_data.get('to_city')
             if not to_city:
                 return Response(
@@ -248,19 +264,363 @@ class RouteAPIView(CreateAPIView):
         if not avg_speed:
             avg_speed = serializer.validated_data.get('avg_speed')
         avg_speed = int(avg_speed)
-        
+
+        algorithm = serializer.validated_data.get('algorithm')
+        shortest, km = utils.create_routes(from_city, to_city, algorithm)
+        time_drive = utils.get_time_drive(km, avg_speed)
+
+        data = {
+            'city': to_city,
+            'shortest_way': shortest,
+            'distance': km,
+            f'time_drive ({avg_speed} km/h)': time_drive,
+        }
+
+        geometry = serializer.validated_data.get('geometry')
+        if geometry:
+            data['geometry'] = utils.get_route_geometry(
+                shortest, geometry, avg_speed,
+            )
+
+        alternatives = serializer.validated_data['alternatives']
+        if alternatives > 1:
+            routes = utils.create_alternative_routes(
+                from_city,
+                to_city,
+                alternatives,
+                serializer.validated_data['max_overlap'],
+            )
+            routes = [
+                (way, distance) for way, distance in routes
+                if way != shortest
+            ][:alternatives - 1]
+            data['alternatives'] = []
+            for way, distance in routes:
+                route = {
+                    'shortest_way': way,
+                    'distance': distance,
+                    f'time_drive ({avg_speed} km/h)': utils.get_time_drive(
+                        distance, avg_speed,
+                    ),
+                }
+                if geometry:
+                    route['geometry'] = utils.get_route_geometry(
+                        way, geometry, avg_speed,
+                    )
+                data['alternatives'].append(route)
+        return Response(data)
+
+
+class RouteBatchAPIView(CreateAPIView):
+    """Show the shortest ways for many pairs of cities at once."""
+
+    serializer_class = serializers.RouteBatchSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        avg_speed = serializer.validated_data['avg_speed']
+        pairs = [
+            (pair['from_city'], pair['to_city'])
+            for pair in serializer.validated_data['routes']
+        ]
+
+        return StreamingHttpResponse(
+            utils.stream_json_list(self.get_results(pairs, avg_speed)),
+            content_type='application/json',
+        )
+
+    def get_results(self, pairs, avg_speed):
+        routes = utils.create_batch_routes(pairs)
+        for from_city, to_city, shortest, km in routes:
+            data = {'from_city': from_city, 'city': to_city}
+            if shortest is None:
+                data['status'] = 'no route'
+            else:
+                time_drive = utils.get_time_drive(km, avg_speed)
+                data['shortest_way'] = shortest
+                data['distance'] = km
+                data[f'time_drive ({avg_speed} km/h)'] = time_drive
+            yield data
+
+
+class DistanceMatrixAPIView(CreateAPIView):
+    """Show distances and drive times from many cities to many cities."""
+
+    serializer_class = serializers.DistanceMatrixSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        origins = serializer.validated_data['origins']
+        destinations = serializer.validated_data['destinations']
+        avg_speed = serializer.validated_data['avg_speed']
+        distances, times = utils.create_distance_matrix(
+            origins,
+            destinations,
+            avg_speed,
+        )
+
+        data = {
+            'origins': origins,
+            'destinations': destinations,
+            'distances': distances,
+            'avg_speed': avg_speed,
+            'hours': times,
+        }
+        return Response(data)
+
+
+class MultiStopAPIView(CreateAPIView):
+    """Show the best order to visit many cities and the ways between them."""
+
+    serializer_class = serializers.MultiStopSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        avg_speed = serializer.validated_data['avg_speed']
+        order, km = utils.create_tour(
+            serializer.validated_data['stops'],
+            serializer.validated_data.get('start'),
+            serializer.validated_data['round_trip'],
+        )
+        if order is None:
+            return Response(
+                data={'status': 'no route'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        data = {
+            'order': order,
+            'distance': km,
+            f'time_drive ({avg_speed} km/h)': utils.get_time_drive(
+                km, avg_speed,
+            ),
+        }
+        geometry = serializer.validated_data.get('geometry')
+        if geometry == 'geojson':
+            # a feature per leg, may be large for many stops
+            return StreamingHttpResponse(
+                utils.stream_feature_collection(
+                    self.get_legs(order, avg_speed, geometry),
+                    **data,
+                ),
+                content_type='application/geo+json',
+            )
+
+        data['legs'] = list(self.get_legs(order, avg_speed, geometry))
+        return Response(data)
+
+    def get_legs(self, order, avg_speed, geometry=None):
+        for from_city, to_city in zip(order, order[1:]):
+            shortest, distance = utils.create_routes(from_city, to_city)
+            leg = {
+                'from_city': from_city,
+                'city': to_city,
+                'shortest_way': shortest,
+                'distance': distance,
+                f'time_drive ({avg_speed} km/h)': utils.get_time_drive(
+                    distance, avg_speed,
+                ),
+            }
+            if geometry == 'geojson':
+                feature = utils.get_route_geometry(
+                    shortest, geometry, avg_speed,
+                )
+                feature['properties'] = {**leg, **feature['properties']}
+                yield feature
+            elif geometry == 'polyline':
+                leg.update(
+                    utils.get_route_geometry(shortest, geometry, avg_speed),
+                )
+                yield leg
+            else:
+                yield leg
+
+
+class CityAutocompleteAPIView(APIView):
+    """Suggest cities for what was typed so far."""
+
+    def get(self, request, *args, **kwargs):
+        serializer = serializers.CityAutocompleteSerializer(
+            data=request.query_params,
+        )
+        serializer.is_valid(raise_exception=True)
+
+        city_index = get_city_index()
+        cities = city_index.autocomplete(
+            serializer.validated_data['q'],
+            serializer.validated_data['limit'],
+        )
+        data = [
+            {'city': city, 'region': city_index.get_region(city)}
+            for city in cities
+        ]
+        return Response(data)
+
+
+class RouteCacheAPIView(APIView):
+    """Show hit/miss/eviction counters of the route cache."""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(utils.route_cache.get_stats())
+
+
+class ReachableAPIView(CreateAPIView):
+    """
+    Show every city reachable from a city within the power reserve
+    of the user's electric car, or within a given distance.
+    """
+
+    serializer_class = serializers.ReachableSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        car = serializer.validated_data.get('car')
+        if car:
+            car = get_object_or_404(
+                ElectricCar,
+                owner=request.user,
+                registration_number=car,
+            )
+            max_distance = car.power_reserve
+        else:
+            max_distance = serializer.validated_data['distance']
+
+        city = serializer.validated_data['city']
+        max_distance, reachable = utils.get_reachable_cities(
+            city,
+            max_distance,
+        )
+
+        data = {
+            'city': city,
+            'distance': max_distance,
+            'cities': [
+                {'city': name, 'distance': km} for name, km in reachable
+            ],
+        }
+        return Response(data)
+
+
+class RefuelRouteAPIView(CreateAPIView):
+    """Show the shortest way with refuelling stops along it."""
+
+    serializer_class = serializers.RefuelSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_car(self, registration_number):
+        car = ElectricCar.objects.filter(
+            owner=self.request.user,
+            registration_number=registration_number,
+        ).first()
+        if car is None:
+            car = get_object_or_404(
+                FuelCar,
+                owner=self.request.user,
+                registration_number=registration_number,
+            )
+        return car
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        electric = False
+        max_range = serializer.validated_data.get('range')
+        registration_number = serializer.validated_data.get('car')
+        if registration_number:
+            car = self.get_car(registration_number)
+            electric = isinstance(car, ElectricCar)
+            max_range = utils.get_car_range(
+                car,
+                serializer.validated_data['tank'],
+            )
+
+        from_city = serializer.validated_data['from_city']
+        to_city = serializer.validated_data['to_city']
         shortest, km = utils.create_routes(from_city, to_city)
+        stops, reached = utils.plan_refuelling(shortest, max_range, electric)
+
+        data = {
+            'city': to_city,
+            'shortest_way': shortest,
+            'distance': km,
+            'range': round(max_range, 2),
+            'status': 'success' if reached else 'not enough range',
+            'stops': [self.get_stop(*stop) for stop in stops],
+        }
+        return Response(data)
+
+    def get_stop(self, station, at, detour):
+        return {
+            'brand': station['brand'],
+            'address': station['address'],
+            'distance': round(at, 2),
+            'detour': round(detour, 2),
+            'url': station['url'],
+        }
 
-        time_drive = round(km / avg_speed, 2)
-        hours_drive = int(time_drive)
-        minutes_drive = ceil(time_drive % 1 * 60)
 
-        time_drive = f'{hours_drive} hours {minutes_drive} minutes'
+class TripCostAPIView(CreateAPIView):
+    """
+    Show fuel and cost of a trip for one of the user's cars,
+    or for all of them when no car is given.
+    """
+
+    serializer_class = serializers.TripCostSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_cars(self, registration_number=None):
+        fuel = FuelCar.objects.select_related('fuel_type__coupon').filter(
+            owner=self.request.user,
+        )
+        elec = ElectricCar.objects.filter(owner=self.request.user)
+        if registration_number:
+            fuel = fuel.filter(registration_number=registration_number)
+            elec = elec.filter(registration_number=registration_number)
+        return list(fuel) + list(elec)
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        cars = self.get_cars(serializer.validated_data.get('car'))
+        if not cars:
+            return Response(
+                data={'status': 'Car not found'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        to_city = serializer.validated_data['to_city']
+        shortest, km = utils.create_routes(
+            serializer.validated_data['from_city'],
+            to_city,
+        )
 
         data = {
             'city': to_city,
             'shortest_way': shortest,
             'distance': km,
-            f'time_drive ({avg_speed} km/h)': time_drive,
+            'cars': [
+                {
+                    'name': car.name,
+                    'registration_number': car.registration_number,
+                    **utils.get_trip_cost(car, km),
+                }
+                for car in cars
+            ],
         }
         return Response(data)